@@ -1,6 +1,6 @@
 {
     "name": "L10N GT EDI",
-    "version": "14.0.0.1.0",
+    "version": "14.0.0.2.0",
     "author": "HomebrewSoft",
     "website": "https://homebrewsoft.dev",
     "license": "LGPL-3",
@@ -14,6 +14,7 @@
         # data
         "data/dte_types.xml",
         "data/frases.xml",
+        "data/ir_cron.xml",
         "data/iva_affiliations.xml",
         "data/server_actions.xml",
         # reports
@@ -21,6 +22,9 @@
         "views/account_journal.xml",
         "views/account_move.xml",
         "views/account_tax.xml",
+        "views/gt_dte_export.xml",
+        "views/gt_dte_job.xml",
+        "views/gt_dte_stats.xml",
         "views/gt_dte_type.xml",
         "views/gt_frases.xml",
         "views/res_company.xml",
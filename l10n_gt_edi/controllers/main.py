@@ -0,0 +1,29 @@
+from odoo import api, http, registry
+from odoo.http import content_disposition, request
+
+
+class DteExportController(http.Controller):
+    @http.route("/l10n_gt_edi/dte_export/<int:export_id>", type="http", auth="user")
+    def dte_export(self, export_id, **kwargs):
+        """Stream the zip file of a `gt.dte.export`. The response is sent after the request
+        cursor is closed, the zip is built with a cursor of its own"""
+        export = request.env["gt.dte.export"].browse(export_id).exists()
+        if not export:
+            return request.not_found()
+        export.check_access_rule("read")
+        filename = export._get_filename()
+        dbname, uid, context = request.env.cr.dbname, request.env.uid, dict(request.env.context)
+
+        def stream():
+            # Runs after the request left its environments, it needs a stack of its own
+            with api.Environment.manage(), registry(dbname).cursor() as cr:
+                env = api.Environment(cr, uid, context)
+                yield from env["gt.dte.export"].browse(export_id)._iter_zip()
+
+        return request.make_response(
+            stream(),
+            headers=[
+                ("Content-Type", "application/zip"),
+                ("Content-Disposition", content_disposition(filename)),
+            ],
+        )
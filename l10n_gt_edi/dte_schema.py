@@ -0,0 +1,78 @@
+"""Validation of DTEs against XSDs, compiled once per process.
+
+The schemas published by SAT are used when they are copied in data/xsd with their own names,
+otherwise the approximations bundled with the module. The imported schemas (xmldsig and the
+complements) are resolved next to them. If there is no schema the documents of its kind aren't
+validated locally and the certifier is the only check.
+"""
+import os
+import threading
+
+from lxml import etree
+
+import logging
+
+_logger = logging.getLogger(__name__)
+SCHEMA_DIR = os.path.join(os.path.dirname(__file__), "data", "xsd")
+# The file of SAT first, then the bundled approximation
+SCHEMA_FILES = {
+    "document": ("GT_Documento-0.2.0.xsd", "approx_documento-0.2.0.xsd"),
+    "annulment": ("GT_AnulacionDocumento-0.1.0.xsd", "approx_anulacion_documento-0.1.0.xsd"),
+}
+MAX_ERRORS = 20
+
+_lock = threading.Lock()
+_schemas = {}
+
+
+def get_schema(kind):
+    """Return the compiled schema of a kind of document, loading it on first use
+    Arguments:
+        kind {str} -- document or annulment
+    Returns:
+        XMLSchema -- The schema, None if there is none
+    """
+    if kind in _schemas:
+        return _schemas[kind]
+    with _lock:
+        if kind not in _schemas:
+            paths = [os.path.join(SCHEMA_DIR, name) for name in SCHEMA_FILES[kind]]
+            path = next((path for path in paths if os.path.isfile(path)), None)
+            if path:
+                parser = etree.XMLParser(no_network=True)
+                _schemas[kind] = etree.XMLSchema(etree.parse(path, parser))
+            else:
+                _logger.warning("No %s schema in %s, not validated locally", kind, SCHEMA_DIR)
+                _schemas[kind] = None
+    return _schemas[kind]
+
+
+def validate(xml, kind):
+    """Validate a DTE against its schema
+    Arguments:
+        xml {str|bytes} -- The document
+        kind {str} -- document or annulment
+    Returns:
+        list -- One message per error with its line, empty if the document is valid
+    """
+    schema = get_schema(kind)
+    if schema is None:
+        return []
+    raw = xml.encode() if isinstance(xml, str) else xml
+    parser = etree.XMLParser(resolve_entities=False, no_network=True)
+    try:
+        document = etree.fromstring(raw, parser)
+    except etree.XMLSyntaxError as error:
+        return [f"Line {error.lineno}: {error.msg}"]
+    # The error log belongs to the schema, shared by the threads of the process
+    with _lock:
+        if schema.validate(document):
+            return []
+        errors = list(schema.error_log)
+    return [f"Line {error.line}: {error.message}" for error in errors[:MAX_ERRORS]]
+
+
+def clear_cache():
+    """Forget the compiled schemas, they are loaded again on next use"""
+    with _lock:
+        _schemas.clear()
@@ -0,0 +1,148 @@
+"""Serializer of DTEs to XML that compiles the templates of gt_sat_api once per process.
+
+`gt_sat_api.parsers` reads and compiles its jinja template for every document. Here the invoice
+template is split in segments at line boundaries and every segment is compiled once. The
+segments of the emisor and of the frases, the same for all the invoices of a company and DTE
+type, are rendered once and reused; only the header, the receptor, the items and the totals
+are rendered per document. The output is the same as the one of the library, the templates
+are read from the installed gt_sat_api so both follow the same version.
+"""
+import io
+import threading
+from importlib import resources
+
+import jinja2
+from gt_sat_api import templates
+from gt_sat_api.parsers import dte_to_xml as library_dte_to_xml
+
+import logging
+
+_logger = logging.getLogger(__name__)
+STATIC_CACHE_SIZE = 256
+# First line of every segment of the invoice template, the header goes before the first one
+SEGMENT_MARKERS = (
+    ("emisor", "<dte:Emisor"),
+    ("receptor", "<dte:Receptor"),
+    ("frases", "{% if dte.frases %}"),
+    ("items", "<dte:Items>"),
+)
+STATIC_SEGMENTS = ("emisor", "frases")
+
+_lock = threading.Lock()
+_segments = None
+_annulment_template = None
+_static_cache = {}
+_buffers = threading.local()
+
+
+def _make_environment(keep_trailing_newline):
+    return jinja2.Environment(
+        trim_blocks=True,
+        lstrip_blocks=True,
+        keep_trailing_newline=keep_trailing_newline,
+    )
+
+
+def _split_template(source):
+    """Split the invoice template in its segments
+    Arguments:
+        source {str} -- The template of gt_sat_api
+    Returns:
+        list -- Pairs of (segment name, compiled template), None if a marker is missing
+    """
+    lines = source.splitlines(keepends=True)
+    starts = [("header", 0)]
+    for name, marker in SEGMENT_MARKERS:
+        start = next(
+            (index for index, line in enumerate(lines) if line.lstrip().startswith(marker)), None
+        )
+        if start is None or start <= starts[-1][1]:
+            return None
+        starts.append((name, start))
+    segments = []
+    for position, (name, start) in enumerate(starts):
+        last = position == len(starts) - 1
+        end = None if last else starts[position + 1][1]
+        # Jinja drops the trailing newline of a template, only the end of the whole template
+        environment = _make_environment(keep_trailing_newline=not last)
+        segments.append((name, environment.from_string("".join(lines[start:end]))))
+    return segments
+
+
+def _get_segments():
+    global _segments
+    if _segments is None:
+        with _lock:
+            if _segments is None:
+                source = resources.read_text(templates, "Factura.xml.jinja")
+                segments = _split_template(source)
+                if segments is None:
+                    _logger.warning(
+                        "Unknown layout of the gt_sat_api invoice template, using its parser"
+                    )
+                _segments = segments or []
+    return _segments
+
+
+def _get_annulment_template():
+    global _annulment_template
+    if _annulment_template is None:
+        source = resources.read_text(templates, "AnulacionDTE.xml.jinja")
+        _annulment_template = _make_environment(keep_trailing_newline=False).from_string(source)
+    return _annulment_template
+
+
+def _render_static(name, template, dte):
+    """Render a segment that only depends on the emisor or on the frases, once per value"""
+    value = dte.emisor if name == "emisor" else dte.frases
+    key = (name, repr(value))
+    rendered = _static_cache.get(key)
+    if rendered is None:
+        if len(_static_cache) >= STATIC_CACHE_SIZE:
+            _static_cache.clear()
+        rendered = _static_cache[key] = template.render(dte=dte)
+    return rendered
+
+
+def _get_buffer():
+    buffer = getattr(_buffers, "buffer", None)
+    if buffer is None:
+        buffer = _buffers.buffer = io.StringIO()
+    buffer.seek(0)
+    buffer.truncate()
+    return buffer
+
+
+def dte_to_xml(dte):
+    """Same as `gt_sat_api.parsers.dte_to_xml`
+    Arguments:
+        dte {DTE} -- The document
+    Returns:
+        str -- The XML of the document
+    """
+    segments = _get_segments()
+    if not segments:
+        return library_dte_to_xml(dte)
+    buffer = _get_buffer()
+    for name, template in segments:
+        if name in STATIC_SEGMENTS:
+            buffer.write(_render_static(name, template, dte))
+        else:
+            buffer.write(template.render(dte=dte))
+    buffer.write("\n")
+    return buffer.getvalue()
+
+
+def dte_to_xml_annulled(adte):
+    """Same as `gt_sat_api.parsers.dte_to_xml_annulled`
+    Arguments:
+        adte {AnulacionDTE} -- The annulment
+    Returns:
+        str -- The XML of the annulment
+    """
+    return _get_annulment_template().render(adte=adte) + "\n"
+
+
+def clear_cache():
+    """Forget the rendered emisors and frases"""
+    _static_cache.clear()
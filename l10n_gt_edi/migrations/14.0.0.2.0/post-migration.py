@@ -0,0 +1,30 @@
+def migrate(cr, version):
+    """Link the XML attachments created before the moves had fields pointing to them"""
+    cr.execute(
+        r"""
+        UPDATE account_move move
+        SET dte_annulled_xml_attachment_id = attachment.id
+        FROM (
+            SELECT DISTINCT ON (res_id) id, res_id
+            FROM ir_attachment
+            WHERE res_model = 'account.move' AND name ILIKE '%\_annulated.xml'
+            ORDER BY res_id, id DESC
+        ) attachment
+        WHERE attachment.res_id = move.id AND move.dte_annulled_xml_attachment_id IS NULL
+        """
+    )
+    cr.execute(
+        r"""
+        UPDATE account_move move
+        SET dte_xml_attachment_id = attachment.id
+        FROM (
+            SELECT DISTINCT ON (res_id) id, res_id
+            FROM ir_attachment
+            WHERE res_model = 'account.move'
+                AND name ILIKE '%.xml'
+                AND name NOT ILIKE '%\_annulated.xml'
+            ORDER BY res_id, id DESC
+        ) attachment
+        WHERE attachment.res_id = move.id AND move.dte_xml_attachment_id IS NULL
+        """
+    )
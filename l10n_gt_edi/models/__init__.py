@@ -1,7 +1,11 @@
 from . import account_move
 from . import account_journal
+from . import gt_dte_export
+from . import gt_dte_job
+from . import gt_dte_stats
 from . import gt_dte_type
 from . import gt_frase
 from . import gt_iva
 from . import res_company
+from . import res_partner
 from . import tax
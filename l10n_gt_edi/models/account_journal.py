@@ -8,3 +8,9 @@ class AccountJournal(models.Model):
         string="Send invoices to SAT",
         default=False,
     )
+    dte_certification_queue = fields.Boolean(
+        string="Certify in background",
+        default=False,
+        help="Posting only queues the invoice, the certification is done by a scheduled job. "
+        "Annulments are always done by the scheduled job",
+    )
@@ -1,8 +1,10 @@
-import base64
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from datetime import datetime
 from pytz import timezone
-from odoo import _, api, fields, models
-from odoo.exceptions import ValidationError
+from odoo import _, api, fields, models, tools
+from odoo.exceptions import UserError, ValidationError
 
 from gt_sat_api import (
     AnulacionDTE,
@@ -18,12 +20,29 @@ from gt_sat_api import (
 )
 from gt_sat_api.parsers import dte_to_xml, dte_to_xml_annulled
 
+from .. import dte_schema, dte_serializer
+from .gt_dte_stats import DteTimer
+
 import logging
 
 _logger = logging.getLogger(__name__)
 DIGITS = 10
 
 
+def _make_emisor(values):
+    return Emisor(**dict(values, direccion=Direccion(**values["direccion"])))
+
+
+def _make_receptor(values):
+    return Receptor(**dict(values, direccion=Direccion(**values["direccion"])))
+
+
+def _make_items(values_list):
+    return [
+        Item(numero_linea=index + 1, **values) for index, values in enumerate(values_list)
+    ]
+
+
 class AccountMove(models.Model):
     _inherit = "account.move"
 
@@ -55,23 +74,112 @@ class AccountMove(models.Model):
         related="journal_id.enable_sending_to_sat",
     )
     annulment_reason = fields.Text()
+    dte_xml_attachment_id = fields.Many2one(
+        comodel_name="ir.attachment",
+        string="DTE XML",
+        copy=False,
+        readonly=True,
+        ondelete="set null",
+    )
+    dte_certified_xml_attachment_id = fields.Many2one(
+        comodel_name="ir.attachment",
+        string="Certified DTE XML",
+        copy=False,
+        readonly=True,
+        ondelete="set null",
+    )
+    dte_annulled_xml_attachment_id = fields.Many2one(
+        comodel_name="ir.attachment",
+        string="Annulment XML",
+        copy=False,
+        readonly=True,
+        ondelete="set null",
+    )
 
     @api.depends("move_type")
     def _compute_allowed_type_ids(self):
         """Method to generate a list of valid dte_type ids and use it to compare in view domain"""
+        DteType = self.env["gt.dte.type"]
         for move in self:
             if move.move_type in ("out_invoice", "in_invoice"):
-                move.allowed_type_ids = self.env["gt.dte.type"].search(
-                    [("general_move_type", "=", "invoice")]
-                )
+                general_move_type = "invoice"
             elif move.move_type in ("out_receipt", "in_receipt"):
-                move.allowed_type_ids = self.env["gt.dte.type"].search(
-                    [("general_move_type", "=", "receipt")]
-                )
+                general_move_type = "receipt"
             else:
-                move.allowed_type_ids = self.env["gt.dte.type"].search(
-                    [("general_move_type", "=", "refund")]
-                )
+                general_move_type = "refund"
+            type_ids = DteType._get_ids_by_general_move_type(general_move_type)
+            move.allowed_type_ids = DteType.browse(type_ids)
+
+    @api.model
+    def _get_dte_address_values(self, partner):
+        """Plain values of the Direccion of a partner or company
+        Returns:
+            dict -- Direccion arguments
+        """
+        return {
+            "direccion": partner.street,
+            "codigo_postal": partner.zip,
+            "municipio": partner.city,
+            "departamento": partner.state_id.name,
+            "pais": partner.country_id.code,
+        }
+
+    @api.model
+    def _get_dte_emisor_values(self, company):
+        """Plain values of the Emisor of a company
+        Returns:
+            dict -- Emisor arguments
+        """
+        return {
+            "afiliacion_iva": company.iva_affiliation_id.code,
+            "codigo_establecimiento": company.codigo_establecimiento,
+            "correo_emisor": company.email,
+            "nit_emisor": company.vat,
+            "nombre_comercial": company.name,
+            "nombre_emisor": company.company_registry,
+            "direccion": self._get_dte_address_values(company),
+        }
+
+    @api.model
+    @tools.ormcache("company_id")
+    def _get_cached_dte_emisor_values(self, company_id):
+        """Emisor values of a company, kept until the company or its partner change
+        Returns:
+            dict -- Emisor arguments, it must not be modified
+        """
+        return self._get_dte_emisor_values(self.env["res.company"].browse(company_id))
+
+    @api.model
+    def _get_dte_receptor_values(self, partner):
+        """Plain values of the Receptor of a partner
+        Returns:
+            dict -- Receptor arguments
+        """
+        return {
+            "correo_receptor": partner.email,
+            "id_receptor": partner.vat,
+            "nombre_receptor": partner.name,
+            "direccion": self._get_dte_address_values(partner),
+        }
+
+    @api.model
+    def _get_dte_item_values(self, line):
+        """Plain values of the Item of an invoice line, without its line number
+        Returns:
+            dict -- Item arguments
+        """
+        return {
+            "bien_o_servicio": "B" if line.product_id.type == "consu" else "S",
+            "cantidad": line.quantity,
+            "unidad_medida": line.product_uom_id.name[:3].upper(),
+            "descripcion": line.product_id.name,
+            "precio_unitario": round(line.price_unit, DIGITS),
+            "descuento_porcentual": line.discount,
+            "impuestos_rate": {
+                tax.code_name: (tax.codigo_unidad_gravable, 100 / len(line.tax_ids))
+                for tax in line.tax_ids
+            },
+        }
 
     def generate_dte_emisor(self):
         """Generate a emisor object to be added in a dte object generation
@@ -79,22 +187,7 @@ class AccountMove(models.Model):
             Emisor -- The emisor object
         """
         self.ensure_one()
-        emisor = Emisor(
-            afiliacion_iva=self.company_id.iva_affiliation_id.code,
-            codigo_establecimiento=self.company_id.codigo_establecimiento,
-            correo_emisor=self.company_id.email,
-            nit_emisor=self.company_id.vat,
-            nombre_comercial=self.company_id.name,
-            nombre_emisor=self.company_id.company_registry,
-            direccion=Direccion(
-                direccion=self.company_id.street,
-                codigo_postal=self.company_id.zip,
-                municipio=self.company_id.city,
-                departamento=self.company_id.state_id.name,
-                pais=self.company_id.country_id.code,
-            ),
-        )
-        return emisor
+        return _make_emisor(self._get_cached_dte_emisor_values(self.company_id.id))
 
     def generate_dte_receptor(self):
         """Generate a receptor object to be added in a dte object generation
@@ -102,19 +195,7 @@ class AccountMove(models.Model):
             Receptor -- The receptor object
         """
         self.ensure_one()
-        receptor = Receptor(
-            correo_receptor=self.partner_id.email,
-            id_receptor=self.partner_id.vat,
-            nombre_receptor=self.partner_id.name,
-            direccion=Direccion(
-                direccion=self.partner_id.street,
-                codigo_postal=self.partner_id.zip,
-                municipio=self.partner_id.city,
-                departamento=self.partner_id.state_id.name,
-                pais=self.partner_id.country_id.code,
-            ),
-        )
-        return receptor
+        return _make_receptor(self._get_dte_receptor_values(self.partner_id))
 
     def generate_dte_items(self):
         """Generate list of item objects added in a dte object generation
@@ -122,23 +203,11 @@ class AccountMove(models.Model):
             list[Item] -- List of items (invoice lines)
         """
         self.ensure_one()
-        items = [
-            Item(
-                bien_o_servicio="B" if line.product_id.type == "consu" else "S",
-                numero_linea=index + 1,
-                cantidad=line.quantity,
-                unidad_medida=line.product_uom_id.name[:3].upper(),
-                descripcion=line.product_id.name,
-                precio_unitario=round(line.price_unit, DIGITS),
-                descuento_porcentual=line.discount,
-                impuestos_rate={
-                    tax.code_name: (tax.codigo_unidad_gravable, 100 / len(line.tax_ids))
-                    for tax in line.tax_ids
-                },
-            )
-            for index, line in enumerate(self.invoice_line_ids)
-        ]
-        return items
+        return _make_items([self._get_dte_item_values(line) for line in self._get_dte_lines()])
+
+    def _get_dte_lines(self):
+        """Invoice lines that are items of the DTE, sections and notes aren't"""
+        return self.invoice_line_ids.filtered(lambda line: not line.display_type)
 
     def generate_dte_complements(self):
         """Generate a list of Complement objects to be added in a dte object generation
@@ -162,32 +231,126 @@ class AccountMove(models.Model):
             complement_list.append(complemento)
         return complement_list
 
+    def _prefetch_dte_data(self):
+        """Read in bulk every record needed to build the DTEs of the moves, so the queries
+        don't grow with the number of moves
+        Returns:
+            dict -- Plain values of the emisor, receptor, frases and items of the moves
+        """
+        partners = self.mapped("partner_id")
+        partners.mapped("state_id.name")
+        partners.mapped("country_id.code")
+        self.mapped("currency_id.name")
+        self.mapped("dte_type_id.code")
+        return {
+            "emisor": {
+                company.id: self._get_cached_dte_emisor_values(company.id)
+                for company in self.mapped("company_id")
+            },
+            "receptor": {
+                move.partner_id.id: self._get_dte_receptor_values(move.partner_id) for move in self
+            },
+            "frases": {
+                dte_type.id: self.env["gt.dte.type"]._get_frases_values(dte_type.id)
+                for dte_type in self.mapped("dte_type_id")
+            },
+            "items": self._get_dte_items_values(),
+        }
+
+    def _get_dte_items_values(self):
+        """Plain values of the Items of all the moves, the same as `_get_dte_item_values` per
+        line. The lines, products, units and taxes are read by columns in one read each and the
+        tax rates are computed once per combination of taxes instead of once per line
+        Returns:
+            dict -- List of Item arguments by move id, in the order of the invoice lines
+        """
+        line_ids = {move.id: move._get_dte_lines().ids for move in self}
+        rows = self.env["account.move.line"].browse(
+            [line_id for ids in line_ids.values() for line_id in ids]
+        ).read(
+            ["quantity", "price_unit", "discount", "product_id", "product_uom_id", "tax_ids"],
+            load=None,
+        )
+        products = {
+            product["id"]: product
+            for product in self.env["product.product"]
+            .browse({row["product_id"] for row in rows if row["product_id"]})
+            .read(["name", "type"])
+        }
+        uoms = {
+            uom["id"]: uom["name"][:3].upper()
+            for uom in self.env["uom.uom"]
+            .browse({row["product_uom_id"] for row in rows if row["product_uom_id"]})
+            .read(["name"])
+        }
+        taxes = {
+            tax["id"]: (tax["code_name"], tax["codigo_unidad_gravable"])
+            for tax in self.env["account.tax"]
+            .browse({tax_id for row in rows for tax_id in row["tax_ids"]})
+            .read(["code_name", "codigo_unidad_gravable"])
+        }
+        rates_by_taxes = {}
+        for row in rows:
+            key = tuple(row["tax_ids"])
+            if key not in rates_by_taxes:
+                rates_by_taxes[key] = {
+                    taxes[tax_id][0]: (taxes[tax_id][1], 100 / len(key)) for tax_id in key
+                }
+        no_product = {"name": False, "type": False}
+        precios = [round(row["price_unit"], DIGITS) for row in rows]
+        values_by_line = {}
+        for row, precio in zip(rows, precios):
+            product = products.get(row["product_id"], no_product)
+            values_by_line[row["id"]] = {
+                "bien_o_servicio": "B" if product["type"] == "consu" else "S",
+                "cantidad": row["quantity"],
+                "unidad_medida": uoms[row["product_uom_id"]],
+                "descripcion": product["name"],
+                "precio_unitario": precio,
+                "descuento_porcentual": row["discount"],
+                "impuestos_rate": dict(rates_by_taxes[tuple(row["tax_ids"])]),
+            }
+        return {
+            move_id: [values_by_line[line_id] for line_id in ids]
+            for move_id, ids in line_ids.items()
+        }
+
+    def generate_dtes(self):
+        """Create the DTE objects of all the moves from data read in bulk
+        Returns:
+            dict -- DTE object by move id
+        """
+        with self._dte_span("orm"):
+            data = self._prefetch_dte_data()
+            emision_datetime = datetime.now().replace(microsecond=0)
+            self.write({"emision_datetime": emision_datetime})
+        fecha_hora_emision = emision_datetime.astimezone(timezone(self.env.user.tz))
+        dtes = {}
+        with self._dte_span("build"):
+            for move in self:
+                dtes[move.id] = DTE(
+                    clase_documento="dte",
+                    codigo_moneda=move.currency_id.name,
+                    fecha_hora_emision=fecha_hora_emision,
+                    tipo=move.dte_type_id.code,
+                    emisor=_make_emisor(data["emisor"][move.company_id.id]),
+                    receptor=_make_receptor(data["receptor"][move.partner_id.id]),
+                    frases=[
+                        Frase(codigo_escenario=code, tipo_frase=type_)
+                        for code, type_ in data["frases"].get(move.dte_type_id.id, ())
+                    ],
+                    items=_make_items(data["items"][move.id]),
+                    complementos=move.generate_dte_complements(),
+                )
+        return dtes
+
     def generate_dte(self):
         """Create a DTE object
         Returns:
             DTE -- A DTE object
         """
         self.ensure_one()
-        emisor = self.generate_dte_emisor()
-        receptor = self.generate_dte_receptor()
-        items = self.generate_dte_items()
-        annulated_date = datetime.now().replace(microsecond=0)
-        self.emision_datetime = annulated_date
-        new_dte = DTE(
-            clase_documento="dte",
-            codigo_moneda=self.currency_id.name,
-            fecha_hora_emision=annulated_date.astimezone(timezone(self.env.user.tz)),
-            tipo=self.dte_type_id.code,
-            emisor=emisor,
-            receptor=receptor,
-            frases=[
-                Frase(codigo_escenario=frase.code, tipo_frase=frase.type)
-                for frase in self.dte_type_id.frases_ids
-            ],
-            items=items,
-            complementos=self.generate_dte_complements(),
-        )
-        return new_dte
+        return self.generate_dtes()[self.id]
 
     def generate_xml_from_dte(self, dte):
         """Call to api gt_sat_api to generate xml string from dte object
@@ -196,24 +359,53 @@ class AccountMove(models.Model):
         Returns:
             str -- String of xml parsed from DTE object
         """
+        if self._use_fast_dte_serializer():
+            return dte_serializer.dte_to_xml(dte)
         xml = dte_to_xml(dte)
         return xml
 
+    @api.model
+    def _use_fast_dte_serializer(self):
+        """Whether the XML is built by `dte_serializer` instead of gt_sat_api, set by the system
+        parameter l10n_gt_edi.fast_xml_serializer"""
+        param = self.env["ir.config_parameter"].sudo().get_param("l10n_gt_edi.fast_xml_serializer")
+        return param not in (False, "", "0", "False", "false")
+
+    @api.model
+    def _use_dte_schema_validation(self):
+        """Whether the XML is validated against the XSDs before sending it, enabled by setting
+        the system parameter l10n_gt_edi.xsd_validation to 1. It is off by default, the bundled
+        schemas are approximations of the ones of SAT, see data/xsd/README.rst"""
+        param = self.env["ir.config_parameter"].sudo().get_param("l10n_gt_edi.xsd_validation")
+        return param in ("1", "True", "true")
+
+    def check_dte_schema(self, xml, kind="document"):
+        """Validate the XML against its XSD, so a malformed document is rejected here
+        instead of after a round trip to the certifier
+        Arguments:
+            xml {str|bytes} -- The XML to send
+            kind {str} -- document or annulment
+        Raises:
+            ValidationError: With the line of every error
+        """
+        self.ensure_one()
+        if not self._use_dte_schema_validation():
+            return True
+        errors = dte_schema.validate(xml, kind)
+        if errors:
+            raise ValidationError(
+                _("The XML of %s doesn't follow the schema of SAT:\n%s")
+                % (self.name, "\n".join(errors))
+            )
+        return True
+
     def search_xml_attachments(self):
         """Search for the invoice xml file in attachments
         Returns:
             record -- ir.attachment record or False
         """
         self.ensure_one()
-        attachment = self.env["ir.attachment"].search(
-            [
-                ("res_model", "=", "account.move"),
-                ("res_id", "=", self.id),
-                ("name", "ilike", ".xml"),
-            ],
-            limit=1,
-        )
-        return attachment
+        return self.dte_xml_attachment_id
 
     def prepare_xml_to_sat(self):
         """Method that returns the invoice xml string
@@ -226,8 +418,7 @@ class AccountMove(models.Model):
         attachment = self.search_xml_attachments()
         if not attachment:
             raise ValidationError(_("There is no XML attached in the invoice"))
-        content = base64.b64decode(attachment.datas)
-        return content
+        return attachment.raw
 
     def prepare_xml_annulated_to_sat(self):
         """Method that returns the invoice xml string
@@ -240,105 +431,232 @@ class AccountMove(models.Model):
         attachment = self.search_annulated_xml_attachments()
         if not attachment:
             raise ValidationError(_("There is no XML attached in the invoice"))
-        content = base64.b64decode(attachment.datas)
-        return content
+        return attachment.raw
 
-    def generate_attachment_from_xml_string(self, xml, info=None):
-        """Update or create a new xml file as attachment
+    def _write_xml_attachment(self, field_name, xml, info):
+        """Update the attachment linked in `field_name` or create and link a new one. The bytes
+        go straight to the filestore, and an attachment with the same content isn't rewritten
         Arguments:
-            xml {str} -- String of xml invoice
+            field_name {str} -- Many2one field of the move pointing to the attachment
+            xml {str|bytes} -- The xml
             info {dict} -- Dictionary containing information to generate attachment
         """
-        attachment = self.search_xml_attachments()
+        self.ensure_one()
+        raw = xml.encode() if isinstance(xml, str) else xml
+        attachment = self[field_name]
         if not attachment:
             data_attach = {
                 "name": info["fname"],
-                "datas": base64.b64encode(xml.encode()),
-                "store_fname": info["fname"],
+                "raw": raw,
                 "description": f"Archivo XML para enviar al SAT - Factura: {info['invoice_name']}",
                 "res_model": "account.move",
                 "res_id": info["invoice_id"],
                 "type": "binary",
+                "mimetype": "application/xml",
             }
-            self.env["ir.attachment"].create(data_attach)
-        else:
-            attachment.datas = base64.b64encode(xml.encode())
-            attachment.mimetype = "application/xml"
+            self[field_name] = self.env["ir.attachment"].create(data_attach)
+        elif attachment.checksum != attachment._compute_checksum(raw):
+            attachment.write({"raw": raw, "mimetype": "application/xml"})
 
-    def generate_annulated_attachment_from_xml_string(self, xml, info=None):
+    def generate_attachment_from_xml_string(self, xml, info=None):
         """Update or create a new xml file as attachment
         Arguments:
             xml {str} -- String of xml invoice
             info {dict} -- Dictionary containing information to generate attachment
         """
-        attachment = self.search_annulated_xml_attachments()
-        if not attachment:
-            data_attach = {
-                "name": info["fname"],
-                "datas": base64.b64encode(xml.encode()),
-                "store_fname": info["fname"],
-                "description": f"Archivo XML para enviar al SAT - Factura: {info['invoice_name']}",
-                "res_model": "account.move",
-                "res_id": info["invoice_id"],
-                "type": "binary",
-            }
-            self.env["ir.attachment"].create(data_attach)
-        else:
-            attachment.datas = base64.b64encode(xml.encode())
-            attachment.mimetype = "application/xml"
+        self._write_xml_attachment("dte_xml_attachment_id", xml, info)
 
-    def generate_dte_xml(self):
-        """Generate an xml file per invoice and save them on attachments"""
-        self.filled_fields_validation()
-        dte = self.generate_dte()
-        xml_str = self.generate_xml_from_dte(dte)
+    def generate_certified_attachment_from_xml_string(self, xml):
+        """Update or create the xml file certified by SAT as attachment
+        Arguments:
+            xml {str} -- String of the certified xml invoice
+        """
+        self.ensure_one()
         info = {
             "invoice_id": self.id,
             "invoice_name": self.name,
-            "fname": dte.tipo + "_" + self.name + ".xml",
+            "fname": self.dte_xml_attachment_id.name.replace(".xml", "_certified.xml"),
         }
-        self.generate_attachment_from_xml_string(xml_str, info)
+        self._write_xml_attachment("dte_certified_xml_attachment_id", xml, info)
+
+    def generate_annulated_attachment_from_xml_string(self, xml, info=None):
+        """Update or create a new xml file as attachment
+        Arguments:
+            xml {str} -- String of xml invoice
+            info {dict} -- Dictionary containing information to generate attachment
+        """
+        self._write_xml_attachment("dte_annulled_xml_attachment_id", xml, info)
+
+    def generate_dte_xml(self):
+        """Generate an xml file per invoice and save them on attachments"""
+        with self._dte_span("orm"):
+            if len(self) == 1:
+                self.filled_fields_validation()
+            else:
+                self.check_dte_preflight()
+            self._assign_sat_identifier()
+        dtes = self.generate_dtes()
+        for move in self:
+            dte = dtes[move.id]
+            with move._dte_span("serialize"):
+                xml_str = move.generate_xml_from_dte(dte)
+            info = {
+                "invoice_id": move.id,
+                "invoice_name": move.name,
+                "fname": dte.tipo + "_" + move.name + ".xml",
+            }
+            with move._dte_span("attachment"):
+                move.generate_attachment_from_xml_string(xml_str, info)
 
     def send_xml_to_sat(self):
         """Function to send the XML string to SAT"""
         _logger.warning("Not implemented!!!")
 
+    def _is_sat_available(self):
+        """Whether SAT can be called now for the company of the move. When it can't the
+        documents are left to the job queue instead of waiting for a timeout each"""
+        return True
+
+    def _reuses_sat_identifier(self):
+        """Whether the next certification of the move repeats an identifier already sent to
+        SAT. The certifier answers it with the document it got the first time, so the XML sent
+        then is sent again as it is instead of being rebuilt with a new emission date"""
+        self.ensure_one()
+        return False
+
+    def _filter_dte_to_build(self):
+        """Moves whose XML has to be built for their certification, the ones resending their
+        stored XML are left out"""
+        return self.filtered(
+            lambda move: not (move.dte_xml_attachment_id and move._reuses_sat_identifier())
+        )
+
+    @api.model
+    def _get_sat_retry_errors(self):
+        """Errors raised while sending a document to SAT that mean it couldn't be reached.
+        On the inline path the document is left to the job queue instead
+        Returns:
+            tuple -- Exception classes
+        """
+        return ()
+
+    def _assign_sat_identifier(self):
+        """Give the moves the identifier sent to SAT with their certification. It is kept between
+        attempts so a retry can't certify the same invoice twice, and it is assigned before the
+        XML is built so the XML stored is the one sent with it"""
+        return True
+
+    def _prepare_sat_request(self):
+        """Collect everything needed to send the invoice XML to SAT
+        Raises:
+            ValidationError: If the XML doesn't follow the schema of SAT
+        Returns:
+            dict -- Request data handed to `_send_sat_request`
+        """
+        self.ensure_one()
+        xml = self.prepare_xml_to_sat()
+        self.check_dte_schema(xml)
+        return {"xml": xml}
+
+    @api.model
+    def _send_sat_request(self, request):
+        """Send a request built by `_prepare_sat_request`. It runs in a worker thread during
+        bulk certification, so it must not use the environment nor the cursor
+        Arguments:
+            request {dict} -- Request data
+        Returns:
+            dict -- The response, its "res" key is True if the document was certified
+        """
+        _logger.warning("Not implemented!!!")
+        return {"res": False, "errors": []}
+
+    def _process_sat_response(self, result):
+        """Save the response of SAT in the invoice
+        Arguments:
+            result {dict} -- Response returned by `_send_sat_request`
+        Returns:
+            bool -- True if the document was certified
+        """
+        self.ensure_one()
+        return bool(result["res"])
+
+    def _prepare_sat_annulment_request(self):
+        """Collect everything needed to send the annulment XML to SAT
+        Raises:
+            ValidationError: If the XML doesn't follow the schema of SAT
+        Returns:
+            dict -- Request data handed to `_send_sat_request`
+        """
+        self.ensure_one()
+        xml = self.prepare_xml_annulated_to_sat()
+        self.check_dte_schema(xml, "annulment")
+        return {"xml": xml}
+
+    def _process_sat_annulment_response(self, result):
+        """Save the response of SAT to an annulment in the invoice
+        Arguments:
+            result {dict} -- Response returned by `_send_sat_request`
+        Returns:
+            bool -- True if the document was annulled
+        """
+        self.ensure_one()
+        return bool(result["res"])
+
     def filled_fields_validation(self):
         """Function to validate the required fields to generate and send the XML"""
         self.ensure_one()
-        if not (self.company_id.iva_affiliation_id and self.company_id.codigo_establecimiento):
-            raise ValidationError(
-                "There's missing information about the company: Check the fields on the DTE section"
+        errors = self._get_dte_validation_errors()
+        if errors:
+            raise ValidationError("\n".join(errors))
+
+    def _get_dte_validation_errors(self):
+        """Every missing data that stops the move from being sent to SAT. The company and
+        partner checks read their stored readiness flags instead of each field
+        Returns:
+            list -- Error messages, empty if the move is ready
+        """
+        self.ensure_one()
+        errors = []
+        if not self.dte_type_id:
+            errors.append(_("The DTE type is missing"))
+        if not self.company_id.dte_ready:
+            errors.append(
+                _("There's missing information about the company: %s")
+                % self.company_id._get_dte_missing_labels()
             )
-        if not (
-            self.company_id.email
-            and self.company_id.vat
-            and self.company_id.company_registry
-            and self.company_id.zip
-            and self.company_id.street
-            and self.company_id.city
-            and self.company_id.state_id.name
-            and self.company_id.country_id.code
-        ):
-            raise ValidationError(
-                _(
-                    "There's missing information about the company: Check the company's registry, email and address"
-                )
+        if not self.partner_id.dte_ready:
+            errors.append(
+                _("There's missing information about the partner %s: %s")
+                % (self.partner_id.display_name, self.partner_id._get_dte_missing_labels())
             )
-        if not (
-            self.partner_id.email
-            and self.partner_id.vat
-            and self.partner_id.zip
-            and self.partner_id.street
-            and self.partner_id.city
-            and self.partner_id.state_id.name
-            and self.partner_id.country_id.code
+        if self.move_type in ("out_refund", "in_refund") and not (
+            self.origin_uuid and self.origin_date
         ):
+            errors.append(_("There is missing information about the original invoice"))
+        return errors
+
+    def _dte_preflight(self):
+        """Check the data of a whole batch before building any XML
+        Returns:
+            dict -- {move: message} for every move that can't be sent
+        """
+        self.mapped("company_id.dte_ready")
+        self.mapped("partner_id.dte_ready")
+        problems = {}
+        for move in self:
+            errors = move._get_dte_validation_errors()
+            if errors:
+                problems[move] = "\n".join(errors)
+        return problems
+
+    def check_dte_preflight(self):
+        """Raise a single error listing the missing data of every move of the batch"""
+        problems = self._dte_preflight()
+        if problems:
             raise ValidationError(
-                _(
-                    "There's missing information about the partner: Check the partner's registry, email and address"
-                )
+                "\n\n".join(f"{move.name}:\n{message}" for move, message in problems.items())
             )
+        return True
 
     def generate_annulated_dte(self):
         """Create a DTE object
@@ -363,34 +681,258 @@ class AccountMove(models.Model):
     def _post(self, soft=True):
         """Post/Validate the documents"""
         res = super(AccountMove, self)._post(soft)
-        self.call_generate_and_send_xml()
+        if self.env.context.get("dte_defer_certification"):
+            return res
+        queued = self.filtered(
+            lambda move: move.journal_id.dte_certification_queue or not move._is_sat_available()
+        )
+        queued._enqueue_dte_certification()
+        (self - queued).call_generate_and_send_xml()
 
         return res
 
+    def _enqueue_dte_certification(self):
+        """Leave the certification of the moves to the background job queue"""
+        moves = self.filtered(lambda move: move.journal_id.enable_sending_to_sat)
+        return self.env["gt.dte.job"].enqueue(moves)
+
+    def _enqueue_dte_annulment(self):
+        """Leave the annulment of the certified moves to the background job queue"""
+        return self.env["gt.dte.job"].enqueue(self._filter_dte_to_annul(), job_type="annul")
+
+    def _filter_dte_to_certify(self):
+        """Posted moves that have to be sent to SAT and aren't certified yet"""
+        return self.filtered(
+            lambda move: move.state == "posted"
+            and move.journal_id.enable_sending_to_sat
+            and move.infile_status != "done"
+        )
+
+    def _filter_dte_to_annul(self):
+        """Moves certified by SAT, the only ones that need an annulment"""
+        return self.filtered(
+            lambda move: move.journal_id.enable_sending_to_sat
+            and move.infile_status in ("done", "annulled_error")
+        )
+
+    @contextmanager
+    def _dte_span(self, stage):
+        """Measure a stage of the certification when a DteTimer is set in the context. Bulk
+        batches set one per move in "dte_timers", a stage run for several moves at once is
+        split among them
+        Arguments:
+            stage {str} -- orm, build, serialize, attachment or network
+        """
+        timer = self.env.context.get("dte_timer")
+        if timer is not None:
+            timers = [timer]
+        else:
+            by_move = self.env.context.get("dte_timers") or {}
+            timers = [by_move[move_id] for move_id in self.ids if move_id in by_move]
+        if not timers:
+            yield
+        else:
+            with DteTimer.shared_span(timers, stage):
+                yield
+
     def call_generate_and_send_xml(self):
         """Call the methods to generate a new XML file and try to send it to SAT"""
+        for move in self._filter_dte_to_certify():
+            timer = DteTimer()
+            move = move.with_context(dte_timer=timer)
+            move._filter_dte_to_build().generate_dte_xml()
+            try:
+                move.send_xml_to_sat()
+            except self._get_sat_retry_errors() as error:
+                _logger.warning("%s will be certified by the job queue: %s", move.name, error)
+                move._enqueue_dte_certification()
+            self.env["gt.dte.stats"].record(move, "certify", timer)
+
+    def certify_dte_bulk(self):
+        """Generate every XML first, send them to SAT concurrently and save the responses
+        Returns:
+            dict -- Batch summary, see `_send_dte_batch`
+        """
+        to_certify = self._filter_dte_to_certify()
+        timers = {move.id: DteTimer() for move in to_certify}
+        to_certify = to_certify.with_context(dte_timers=timers)
+        to_build = to_certify._filter_dte_to_build()
+        with to_build._dte_span("orm"):
+            failed = to_build._dte_preflight()
+        to_build = to_build.filtered(lambda move: move not in failed)
+        try:
+            with self.env.cr.savepoint():
+                to_build.generate_dte_xml()
+        except Exception:
+            # A move the preflight let through can't be built, isolate it from the batch
+            for move in to_build:
+                try:
+                    with self.env.cr.savepoint():
+                        move.generate_dte_xml()
+                except Exception as error:
+                    _logger.warning("Couldn't build the DTE of %s: %s", move.name, error)
+                    failed[move] = str(error)
+        to_certify = to_certify.filtered(lambda move: move not in failed)
+        summary = to_certify._send_dte_batch("_prepare_sat_request", "_process_sat_response")
+        self.env["gt.dte.stats"].record_batch(to_certify, "certify", timers)
+        summary["failed"].update(failed)
+        _logger.info(
+            "DTE batch certification: %s done, %s failed, %s to retry",
+            len(summary["done"]),
+            len(summary["failed"]),
+            len(summary["retry"]),
+        )
+        return summary
+
+    def annul_dte_bulk(self):
+        """Generate every annulment XML first, send them to SAT concurrently and save the responses
+        Returns:
+            dict -- Batch summary, see `_send_dte_batch`
+        """
+        candidates = self._filter_dte_to_annul()
+        timers = {move.id: DteTimer() for move in candidates}
+        candidates = candidates.with_context(dte_timers=timers)
+        to_annul = candidates.browse()
+        with candidates._dte_span("orm"):
+            failed = candidates._dte_preflight()
+        for move in candidates.filtered(lambda move: move not in failed):
+            try:
+                with self.env.cr.savepoint():
+                    move.generate_dte_xml_annulated()
+                to_annul |= move
+            except Exception as error:
+                # Keep a move that can't be built from failing the whole batch
+                _logger.warning("Couldn't build the annulment of %s: %s", move.name, error)
+                failed[move] = str(error)
+        summary = to_annul._send_dte_batch(
+            "_prepare_sat_annulment_request", "_process_sat_annulment_response"
+        )
+        self.env["gt.dte.stats"].record_batch(to_annul, "annul", timers)
+        summary["failed"].update(failed)
+        _logger.info(
+            "DTE batch annulment: %s done, %s failed, %s to retry",
+            len(summary["done"]),
+            len(summary["failed"]),
+            len(summary["retry"]),
+        )
+        return summary
+
+    def _send_dte_batch(self, prepare_method, process_method):
+        """Prepare a request per move, send them concurrently and process the responses. The
+        stages are measured in the DteTimer of each move set by the bulk methods, if any
+        Arguments:
+            prepare_method {str} -- Method of the move returning its request data
+            process_method {str} -- Method of the move saving a response, True on success
+        Returns:
+            dict -- The accepted moves in "done", a reason per move rejected in "failed" and
+                    per move that couldn't reach SAT in "retry"
+        """
+        failed = {}
+        retry = {}
+        requests = []
         for move in self:
-            if not move.journal_id.enable_sending_to_sat:
-                continue
-            if move.infile_status == "done":
+            try:
+                with move._dte_span("attachment"):
+                    requests.append((move, getattr(move, prepare_method)()))
+            except UserError as error:
+                failed[move] = str(error)
+        results = self._send_sat_requests(requests)
+        done = self.browse()
+        for (move, request), result in zip(requests, results):
+            if isinstance(result, Exception):
+                retry[move] = str(result)
                 continue
-            move.generate_dte_xml()
-            move.send_xml_to_sat()
+            with move._dte_span("attachment"):
+                processed = getattr(move, process_method)(result)
+            if processed:
+                done |= move
+            else:
+                failed[move] = _("Rejected by SAT, check the invoice messages")
+        return {"done": done, "failed": failed, "retry": retry}
+
+    def _send_sat_requests(self, requests):
+        """Send the prepared requests through a thread pool bounded per company
+        Arguments:
+            requests {list} -- Pairs of (move, request data)
+        Returns:
+            list -- The response of each request, or the exception raised while sending it
+        """
+        results = [None] * len(requests)
+        timers = self.env.context.get("dte_timers") or {}
+
+        def send(move, request):
+            # Each move is sent by a single thread, its timer isn't shared
+            if move.id not in timers:
+                return self._send_sat_request(request)
+            with timers[move.id].span("network"):
+                return self._send_sat_request(request)
+
+        indexes_by_company = defaultdict(list)
+        for index, (move, request) in enumerate(requests):
+            indexes_by_company[move.company_id].append(index)
+        for company, indexes in indexes_by_company.items():
+            workers = max(company.dte_certification_workers, 1)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(send, *requests[index]): index
+                    for index in indexes
+                }
+                for future in as_completed(futures):
+                    try:
+                        results[futures[future]] = future.result()
+                    except Exception as error:
+                        results[futures[future]] = error
+        return results
+
+    def action_certify_dte_bulk(self):
+        """Certify the moves in bulk and notify the summary of the batch"""
+        return self._get_dte_batch_notification(self.certify_dte_bulk())
+
+    @api.model
+    def _get_dte_batch_notification(self, summary):
+        """Client action notifying the summary of a certification batch
+        Arguments:
+            summary {dict} -- Batch summary, see `_send_dte_batch`
+        Returns:
+            dict -- display_notification client action
+        """
+        failed = {**summary["failed"], **summary["retry"]}
+        message = _("%s documents certified, %s failed.") % (len(summary["done"]), len(failed))
+        if failed:
+            message += "\n" + "\n".join(
+                f"{move.name}: {reason}" for move, reason in failed.items()
+            )
+        return {
+            "type": "ir.actions.client",
+            "tag": "display_notification",
+            "params": {
+                "title": _("DTE certification"),
+                "message": message,
+                "type": "warning" if failed else "success",
+                "sticky": bool(failed),
+            },
+        }
 
     def generate_annulate_xml_from_dte(self, dte):
+        if self._use_fast_dte_serializer():
+            return dte_serializer.dte_to_xml_annulled(dte)
         xml_anulated = dte_to_xml_annulled(dte)
         return xml_anulated
 
     def generate_dte_xml_annulated(self):
-        self.filled_fields_validation()
-        dte = self.generate_annulated_dte()
-        xml_str = self.generate_annulate_xml_from_dte(dte)
+        with self._dte_span("orm"):
+            self.filled_fields_validation()
+        with self._dte_span("build"):
+            dte = self.generate_annulated_dte()
+        with self._dte_span("serialize"):
+            xml_str = self.generate_annulate_xml_from_dte(dte)
         info = {
             "invoice_id": self.id,
             "invoice_name": self.name,
             "fname": self.name + "_annulated.xml",
         }
-        self.generate_annulated_attachment_from_xml_string(xml_str, info)
+        with self._dte_span("attachment"):
+            self.generate_annulated_attachment_from_xml_string(xml_str, info)
 
     def search_annulated_xml_attachments(self):
         """Search for the invoice xml file in attachments
@@ -398,24 +940,23 @@ class AccountMove(models.Model):
             record -- ir.attachment record or False
         """
         self.ensure_one()
-        attachment = self.env["ir.attachment"].search(
-            [
-                ("res_model", "=", "account.move"),
-                ("res_id", "=", self.id),
-                ("name", "ilike", "_annulated.xml"),
-            ],
-            limit=1,
-        )
-        return attachment
+        return self.dte_annulled_xml_attachment_id
 
     def call_generate_and_send_xml_annulated(self):
         """Call the methods to generate a new XML file and try to send it to SAT"""
-        for move in self:
+        for move in self._filter_dte_to_annul():
+            timer = DteTimer()
+            move = move.with_context(dte_timer=timer)
             move.generate_dte_xml_annulated()
-            move.send_xml_annulated_to_sat()
+            try:
+                move.send_xml_annulated_to_sat()
+            except self._get_sat_retry_errors() as error:
+                _logger.warning("%s will be annulled by the job queue: %s", move.name, error)
+                move._enqueue_dte_annulment()
+            self.env["gt.dte.stats"].record(move, "annul", timer)
 
     def button_cancel(self):
         # OVERRIDE
         res = super().button_cancel()
-        self.call_generate_and_send_xml_annulated()
+        self._enqueue_dte_annulment()
         return res
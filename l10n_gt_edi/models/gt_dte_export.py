@@ -0,0 +1,130 @@
+import io
+import zipfile
+
+from odoo import _, api, fields, models
+from odoo.exceptions import UserError, ValidationError
+
+BATCH_SIZE = 500
+CHUNK_SIZE = 64 * 1024
+
+
+class _ZipBuffer(io.RawIOBase):
+    """Write-only stream that keeps what the zip writer produced until it is drained. The zip
+    file is written as a non seekable stream, so every entry goes out as soon as it's done"""
+
+    def __init__(self):
+        super(_ZipBuffer, self).__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class DteExport(models.TransientModel):
+    _name = "gt.dte.export"
+    _description = "Export Certified DTE XML"
+
+    company_id = fields.Many2one(
+        comodel_name="res.company",
+        required=True,
+        default=lambda self: self.env.company,
+    )
+    date_from = fields.Date(required=True)
+    date_to = fields.Date(required=True)
+    include_annulled = fields.Boolean(
+        string="Include annulments",
+        default=True,
+        help="Add the XML of the annulments of the exported documents",
+    )
+
+    @api.constrains("date_from", "date_to")
+    def _check_dates(self):
+        for export in self:
+            if export.date_from > export.date_to:
+                raise ValidationError(_("The start date must be before the end date"))
+
+    def _get_move_domain(self):
+        self.ensure_one()
+        return [
+            ("company_id", "=", self.company_id.id),
+            ("invoice_date", ">=", self.date_from),
+            ("invoice_date", "<=", self.date_to),
+            ("dte_certified_xml_attachment_id", "!=", False),
+        ]
+
+    def _get_filename(self):
+        self.ensure_one()
+        company = self.company_id.vat or self.company_id.id
+        return f"DTE_{company}_{self.date_from}_{self.date_to}.zip"
+
+    def action_export(self):
+        self.ensure_one()
+        if not self.env["account.move"].search_count(self._get_move_domain()):
+            raise UserError(_("There are no certified documents in the period"))
+        return {
+            "type": "ir.actions.act_url",
+            "url": f"/l10n_gt_edi/dte_export/{self.id}",
+            "target": "self",
+        }
+
+    def _iter_attachments(self):
+        """Attachments to export, read in batches of ids after the last one so the memory
+        doesn't grow with the period
+        Yields:
+            tuple -- (path in the zip, attachment values)
+        """
+        self.ensure_one()
+        Move = self.env["account.move"]
+        Attachment = self.env["ir.attachment"].sudo()
+        fields_to_read = ["dte_certified_xml_attachment_id"]
+        if self.include_annulled:
+            fields_to_read.append("dte_annulled_xml_attachment_id")
+        last_id = 0
+        while True:
+            moves = Move.search(
+                self._get_move_domain() + [("id", ">", last_id)], limit=BATCH_SIZE, order="id"
+            )
+            if not moves:
+                return
+            last_id = moves[-1].id
+            rows = moves.read(fields_to_read, load=None)
+            attachment_ids = [row[name] for row in rows for name in fields_to_read if row[name]]
+            attachments = {
+                attachment["id"]: attachment
+                for attachment in Attachment.browse(attachment_ids).read(["name", "store_fname"])
+            }
+            for row in rows:
+                for name, folder in zip(fields_to_read, ("certified", "annulled")):
+                    attachment = attachments.get(row[name])
+                    if attachment:
+                        yield f"{folder}/{attachment['name'].replace('/', '_')}", attachment
+            self.env.invalidate_all()
+
+    def _iter_zip(self):
+        """Build the zip file of the export piece by piece, reading the filestore in chunks
+        Yields:
+            bytes -- The next part of the zip file
+        """
+        Attachment = self.env["ir.attachment"].sudo()
+        buffer = _ZipBuffer()
+        with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+            for path, attachment in self._iter_attachments():
+                with archive.open(path, mode="w") as entry:
+                    if attachment["store_fname"]:
+                        with open(Attachment._full_path(attachment["store_fname"]), "rb") as file:
+                            for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+                                entry.write(chunk)
+                                yield buffer.drain()
+                    else:
+                        entry.write(Attachment.browse(attachment["id"]).raw or b"")
+                yield buffer.drain()
+        yield buffer.drain()
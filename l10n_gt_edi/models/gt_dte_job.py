@@ -0,0 +1,221 @@
+import time
+from datetime import timedelta
+
+from odoo import _, api, fields, models
+from odoo.exceptions import UserError
+
+import logging
+
+_logger = logging.getLogger(__name__)
+MAX_ATTEMPTS = 5
+RETRY_DELAY = 60  # seconds, doubled on every failed attempt
+STALE_AFTER = 15  # minutes a job can stay running before it's considered dead
+CRON_TIME_LIMIT = 240  # seconds a cron run keeps taking batches, under its 5 minutes interval
+
+
+class DteJob(models.Model):
+    _name = "gt.dte.job"
+    _description = "DTE Certification Job"
+    _order = "id"
+
+    move_id = fields.Many2one(
+        comodel_name="account.move",
+        required=True,
+        ondelete="cascade",
+        index=True,
+    )
+    company_id = fields.Many2one(
+        related="move_id.company_id",
+        store=True,
+    )
+    job_type = fields.Selection(
+        [
+            ("certify", "Certification"),
+            ("annul", "Annulment"),
+        ],
+        default="certify",
+        required=True,
+    )
+    state = fields.Selection(
+        [
+            ("pending", "Pending"),
+            ("running", "Running"),
+            ("done", "Done"),
+            ("failed", "Failed"),
+        ],
+        default="pending",
+        required=True,
+        index=True,
+    )
+    attempts = fields.Integer(readonly=True)
+    next_attempt = fields.Datetime(
+        default=fields.Datetime.now,
+        index=True,
+    )
+    last_error = fields.Text(readonly=True)
+    date_started = fields.Datetime(readonly=True)
+
+    @api.model
+    def enqueue(self, moves, job_type="certify"):
+        """Create a pending job for every move that doesn't have one yet and wake up the runner
+        Arguments:
+            moves {account.move} -- Moves to certify or annul
+            job_type {str} -- certify or annul
+        Returns:
+            gt.dte.job -- The created jobs
+        """
+        queued = self.sudo().search(
+            [
+                ("move_id", "in", moves.ids),
+                ("job_type", "=", job_type),
+                ("state", "in", ("pending", "running")),
+            ]
+        )
+        to_queue = moves - queued.move_id
+        jobs = self.sudo().create(
+            [{"move_id": move.id, "job_type": job_type} for move in to_queue]
+        )
+        if jobs:
+            self.env.ref("l10n_gt_edi.ir_cron_process_dte_jobs").sudo()._trigger()
+        return jobs
+
+    def _acquire(self, limit):
+        """Lock a batch of due jobs, skipping the ones locked by another worker
+        Arguments:
+            limit {int} -- Maximum number of jobs to take
+        Returns:
+            gt.dte.job -- The locked jobs, already marked as running
+        """
+        self.env.cr.execute(
+            """
+            SELECT id FROM gt_dte_job
+            WHERE state = 'pending' AND next_attempt <= %s
+            ORDER BY id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+            """,
+            (fields.Datetime.now(), limit),
+        )
+        jobs = self.browse([row[0] for row in self.env.cr.fetchall()])
+        # Moves reset to draft or cancelled after they were queued aren't certified anymore
+        unposted = jobs.filtered(
+            lambda job: job.job_type == "certify" and job.move_id.state != "posted"
+        )
+        unposted.write(
+            {"state": "done", "last_error": _("Not certified, the document isn't posted")}
+        )
+        jobs -= unposted
+        jobs.write({"state": "running", "date_started": fields.Datetime.now()})
+        jobs.filtered(lambda job: job.job_type == "certify").mapped(
+            "move_id"
+        )._assign_sat_identifier()
+        return jobs
+
+    @api.model
+    def _recover_stale_jobs(self):
+        """Put back in the queue the jobs left running by a worker that died. They are sent again
+        with the identifier saved before the first attempt, so SAT answers with the document
+        it certified, if any, instead of certifying it twice
+        Returns:
+            gt.dte.job -- The recovered jobs
+        """
+        jobs = self.search(
+            [
+                ("state", "=", "running"),
+                ("date_started", "<", fields.Datetime.now() - timedelta(minutes=STALE_AFTER)),
+            ]
+        )
+        if jobs:
+            _logger.warning("Recovering %s stale DTE jobs", len(jobs))
+            jobs.write({"state": "pending", "next_attempt": fields.Datetime.now()})
+        return jobs
+
+    def _run(self):
+        """Certify or annul the moves of the jobs in one concurrent batch per job type
+        Returns:
+            dict -- Batch summary of `account.move._send_dte_batch` for all the jobs
+        """
+        summary = {"done": self.env["account.move"], "failed": {}, "retry": {}}
+        for job_type, method in (("certify", "certify_dte_bulk"), ("annul", "annul_dte_bulk")):
+            moves = self.filtered(lambda job: job.job_type == job_type).mapped("move_id")
+            if moves:
+                batch = getattr(moves, method)()
+                summary["done"] |= batch["done"]
+                summary["failed"].update(batch["failed"])
+                summary["retry"].update(batch["retry"])
+        return summary
+
+    def _postpone(self):
+        """Wait for SAT to be available again without counting an attempt"""
+        if not self:
+            return
+        next_attempt = fields.Datetime.now() + timedelta(seconds=RETRY_DELAY)
+        self.write({"state": "pending", "next_attempt": next_attempt})
+        self.env.ref("l10n_gt_edi.ir_cron_process_dte_jobs").sudo()._trigger(next_attempt)
+
+    def _mark_failed(self, error, retry=True):
+        """Schedule a new attempt with exponential backoff, or give up
+        Arguments:
+            error {str} -- The error of the last attempt
+            retry {bool} -- False if a new attempt would fail the same way
+        """
+        for job in self:
+            attempts = job.attempts + 1
+            if not retry or attempts >= MAX_ATTEMPTS:
+                job.write({"state": "failed", "attempts": attempts, "last_error": error})
+                continue
+            job.write(
+                {
+                    "state": "pending",
+                    "attempts": attempts,
+                    "last_error": error,
+                    "next_attempt": fields.Datetime.now()
+                    + timedelta(seconds=RETRY_DELAY * 2 ** (attempts - 1)),
+                }
+            )
+
+    def process(self, limit=50, auto_commit=True):
+        """Take a batch of due jobs and run them together
+        Arguments:
+            limit {int} -- Maximum number of jobs to process
+            auto_commit {bool} -- Commit after locking the jobs, which also saves the identifiers
+                                  of the documents, and after running the batch. Disable it
+                                  in tests
+        Returns:
+            gt.dte.job -- The processed jobs
+        """
+        jobs = self._acquire(limit)
+        unavailable = jobs.filtered(lambda job: not job.move_id._is_sat_available())
+        unavailable._postpone()
+        jobs -= unavailable
+        if auto_commit:
+            self.env.cr.commit()
+        try:
+            with self.env.cr.savepoint():
+                summary = jobs._run()
+        except Exception as error:
+            _logger.warning("DTE jobs %s failed: %s", jobs.ids, error)
+            jobs._mark_failed(str(error), retry=not isinstance(error, UserError))
+        else:
+            for job in jobs:
+                if job.move_id in summary["retry"]:
+                    job._mark_failed(summary["retry"][job.move_id])
+                elif job.move_id in summary["failed"]:
+                    job._mark_failed(summary["failed"][job.move_id], retry=False)
+                else:
+                    job.write({"state": "done", "attempts": job.attempts + 1, "last_error": False})
+        if auto_commit:
+            self.env.cr.commit()
+        return jobs
+
+    @api.model
+    def _cron_process_jobs(self):
+        """Take batches until the queue is empty, so a backlog is drained in one run"""
+        self._recover_stale_jobs()
+        deadline = time.monotonic() + CRON_TIME_LIMIT
+        while self.process() and time.monotonic() < deadline:
+            pass
+
+    def action_retry(self):
+        self.write({"state": "pending", "next_attempt": fields.Datetime.now()})
+        self.env.ref("l10n_gt_edi.ir_cron_process_dte_jobs").sudo()._trigger()
@@ -0,0 +1,171 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+from time import perf_counter
+
+from odoo import _, api, fields, models, tools
+
+import logging
+
+_logger = logging.getLogger(__name__)
+STAGES = ("orm", "build", "serialize", "attachment", "network")
+STATS_RETENTION_DAYS = 90
+
+
+class DteTimer:
+    """Time spent in each stage of the certification of one document"""
+
+    def __init__(self):
+        self.start = perf_counter()
+        self.spans = defaultdict(float)
+
+    @contextmanager
+    def span(self, stage):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.spans[stage] += perf_counter() - start
+
+    @staticmethod
+    @contextmanager
+    def shared_span(timers, stage):
+        """Measure a stage run for several documents at once, its time is split among them"""
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            share = (perf_counter() - start) / len(timers)
+            for timer in timers:
+                timer.spans[stage] += share
+
+    def elapsed(self):
+        return perf_counter() - self.start
+
+
+class DteStats(models.Model):
+    _name = "gt.dte.stats"
+    _description = "DTE Certification Timing"
+    _order = "id desc"
+
+    move_id = fields.Many2one(
+        comodel_name="account.move",
+        ondelete="cascade",
+        index=True,
+    )
+    company_id = fields.Many2one(comodel_name="res.company")
+    journal_id = fields.Many2one(comodel_name="account.journal")
+    operation = fields.Selection(
+        [
+            ("certify", "Certification"),
+            ("annul", "Annulment"),
+        ]
+    )
+    orm_ms = fields.Float(string="ORM reads (ms)")
+    build_ms = fields.Float(string="DTE build (ms)")
+    serialize_ms = fields.Float(string="XML serialization (ms)")
+    attachment_ms = fields.Float(string="Attachments (ms)")
+    network_ms = fields.Float(string="Network (ms)")
+    total_ms = fields.Float(string="Total (ms)")
+
+    @api.model
+    def record(self, move, operation, timer):
+        """Save the timing of a certification and log it if it was slow
+        Arguments:
+            move {account.move} -- The certified move
+            operation {str} -- certify or annul
+            timer {DteTimer} -- The measured spans
+        """
+        return self.record_batch(move, operation, {move.id: timer})
+
+    @api.model
+    def record_batch(self, moves, operation, timers):
+        """Save the timings of a batch in a single create and log the slow documents
+        Arguments:
+            moves {account.move} -- The certified moves
+            operation {str} -- certify or annul
+            timers {dict} -- DteTimer by move id
+        """
+        threshold = float(
+            self.env["ir.config_parameter"].sudo().get_param("l10n_gt_edi.slow_document_ms", 5000)
+        )
+        vals_list = []
+        for move in moves:
+            timer = timers[move.id]
+            values = {f"{stage}_ms": timer.spans[stage] * 1000 for stage in STAGES}
+            values.update(
+                {
+                    "move_id": move.id,
+                    "company_id": move.company_id.id,
+                    "journal_id": move.journal_id.id,
+                    "operation": operation,
+                    "total_ms": timer.elapsed() * 1000,
+                }
+            )
+            if values["total_ms"] > threshold:
+                spans = ", ".join(f"{stage}={values[stage + '_ms']:.0f}ms" for stage in STAGES)
+                _logger.warning(
+                    "Slow DTE %s of %s: %.0fms (%s)",
+                    operation,
+                    move.name,
+                    values["total_ms"],
+                    spans,
+                )
+            vals_list.append(values)
+        return self.sudo().create(vals_list)
+
+    @api.autovacuum
+    def _gc_old_stats(self):
+        limit = fields.Datetime.now() - timedelta(days=STATS_RETENTION_DAYS)
+        self.sudo().search([("create_date", "<", limit)]).unlink()
+
+
+class DteStatsReport(models.Model):
+    _name = "gt.dte.stats.report"
+    _description = "DTE Certification Timing Percentiles"
+    _auto = False
+    _order = "company_id, journal_id, operation"
+
+    company_id = fields.Many2one(comodel_name="res.company", readonly=True)
+    journal_id = fields.Many2one(comodel_name="account.journal", readonly=True)
+    operation = fields.Selection(
+        [
+            ("certify", "Certification"),
+            ("annul", "Annulment"),
+        ],
+        readonly=True,
+    )
+    count = fields.Integer(readonly=True)
+    total_p50 = fields.Float(string="Total p50 (ms)", readonly=True)
+    total_p95 = fields.Float(string="Total p95 (ms)", readonly=True)
+    network_p50 = fields.Float(string="Network p50 (ms)", readonly=True)
+    network_p95 = fields.Float(string="Network p95 (ms)", readonly=True)
+    orm_p95 = fields.Float(string="ORM reads p95 (ms)", readonly=True)
+    build_p95 = fields.Float(string="DTE build p95 (ms)", readonly=True)
+    serialize_p95 = fields.Float(string="XML serialization p95 (ms)", readonly=True)
+    attachment_p95 = fields.Float(string="Attachments p95 (ms)", readonly=True)
+
+    def init(self):
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        self.env.cr.execute(
+            """
+            CREATE VIEW gt_dte_stats_report AS (
+                SELECT
+                    MIN(id) AS id,
+                    company_id,
+                    journal_id,
+                    operation,
+                    COUNT(*) AS count,
+                    percentile_cont(0.5) WITHIN GROUP (ORDER BY total_ms) AS total_p50,
+                    percentile_cont(0.95) WITHIN GROUP (ORDER BY total_ms) AS total_p95,
+                    percentile_cont(0.5) WITHIN GROUP (ORDER BY network_ms) AS network_p50,
+                    percentile_cont(0.95) WITHIN GROUP (ORDER BY network_ms) AS network_p95,
+                    percentile_cont(0.95) WITHIN GROUP (ORDER BY orm_ms) AS orm_p95,
+                    percentile_cont(0.95) WITHIN GROUP (ORDER BY build_ms) AS build_p95,
+                    percentile_cont(0.95) WITHIN GROUP (ORDER BY serialize_ms) AS serialize_p95,
+                    percentile_cont(0.95) WITHIN GROUP (ORDER BY attachment_ms) AS attachment_p95
+                FROM gt_dte_stats
+                GROUP BY company_id, journal_id, operation
+            )
+            """
+        )
@@ -1,4 +1,4 @@
-from odoo import _, api, fields, models
+from odoo import _, api, fields, models, tools
 
 
 class DteType(models.Model):
@@ -17,3 +17,40 @@ class DteType(models.Model):
     active = fields.Boolean(
         default=True,
     )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super(DteType, self).create(vals_list)
+        self.clear_caches()
+        return records
+
+    def write(self, vals):
+        res = super(DteType, self).write(vals)
+        self.clear_caches()
+        return res
+
+    def unlink(self):
+        res = super(DteType, self).unlink()
+        self.clear_caches()
+        return res
+
+    @api.model
+    @tools.ormcache("dte_type_id")
+    def _get_frases_values(self, dte_type_id):
+        """Frases of a DTE type, kept until a DTE type or a frase change
+        Returns:
+            tuple -- Pairs of (codigo_escenario, tipo_frase)
+        """
+        return tuple((frase.code, frase.type) for frase in self.browse(dte_type_id).frases_ids)
+
+    @api.model
+    @tools.ormcache("general_move_type")
+    def _get_ids_by_general_move_type(self, general_move_type):
+        """Active DTE types of a general move type, kept until a DTE type changes
+        Returns:
+            tuple -- Ids of the DTE types
+        """
+        dte_types = self.with_context(active_test=True).search(
+            [("general_move_type", "=", general_move_type)]
+        )
+        return tuple(dte_types.ids)
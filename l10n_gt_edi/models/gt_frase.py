@@ -8,3 +8,13 @@ class Frase(models.Model):
     name = fields.Char(string="Tipo")
     code = fields.Integer()
     setting = fields.Char(string="Escenario")
+
+    def write(self, vals):
+        res = super(Frase, self).write(vals)
+        self.clear_caches()
+        return res
+
+    def unlink(self):
+        res = super(Frase, self).unlink()
+        self.clear_caches()
+        return res
@@ -6,3 +6,8 @@ class IvaAffiliation(models.Model):
 
     name = fields.Char()
     code = fields.Char()
+
+    def write(self, vals):
+        res = super(IvaAffiliation, self).write(vals)
+        self.clear_caches()
+        return res
@@ -1,8 +1,67 @@
 from odoo import _, api, fields, models
 
+DTE_EMISOR_FIELDS = {
+    "iva_affiliation_id",
+    "codigo_establecimiento",
+    "email",
+    "vat",
+    "name",
+    "company_registry",
+    "street",
+    "zip",
+    "city",
+    "state_id",
+    "country_id",
+}
+DTE_PARTNER_FIELDS = ("email", "vat", "zip", "street", "city", "state_id", "country_id")
+DTE_COMPANY_FIELDS = ("iva_affiliation_id", "codigo_establecimiento", "company_registry")
+
 
 class Company(models.Model):
     _inherit = "res.company"
 
     iva_affiliation_id = fields.Many2one(comodel_name="gt.iva", string="Afiliacion IVA")
     codigo_establecimiento = fields.Integer()
+    dte_certification_workers = fields.Integer(
+        string="Concurrent certifications",
+        default=4,
+        help="Maximum number of documents sent to SAT at the same time in bulk certification",
+    )
+    dte_missing_fields = fields.Char(
+        compute="_compute_dte_missing_fields",
+        store=True,
+        help="Technical names of the fields required by the DTEs that are empty",
+    )
+    dte_ready = fields.Boolean(
+        string="Ready for DTE",
+        compute="_compute_dte_missing_fields",
+        store=True,
+    )
+
+    @api.depends(
+        *DTE_COMPANY_FIELDS,
+        *(f"partner_id.{field_name}" for field_name in DTE_PARTNER_FIELDS),
+    )
+    def _compute_dte_missing_fields(self):
+        for company in self:
+            missing = [field_name for field_name in DTE_COMPANY_FIELDS if not company[field_name]]
+            missing += [
+                field_name for field_name in DTE_PARTNER_FIELDS if not company.partner_id[field_name]
+            ]
+            company.dte_missing_fields = ",".join(missing)
+            company.dte_ready = not missing
+
+    def _get_dte_missing_labels(self):
+        """Labels of the empty fields required by the DTEs, in the language of the user"""
+        self.ensure_one()
+        return ", ".join(
+            self._fields[field_name]._description_string(self.env)
+            for field_name in (self.dte_missing_fields or "").split(",")
+            if field_name
+        )
+
+    def write(self, vals):
+        res = super(Company, self).write(vals)
+        if DTE_EMISOR_FIELDS.intersection(vals):
+            self.clear_caches()
+        return res
@@ -0,0 +1,42 @@
+from odoo import _, api, fields, models
+
+from .res_company import DTE_EMISOR_FIELDS, DTE_PARTNER_FIELDS
+
+
+class Partner(models.Model):
+    _inherit = "res.partner"
+
+    dte_missing_fields = fields.Char(
+        compute="_compute_dte_missing_fields",
+        store=True,
+        help="Technical names of the fields required by the DTEs that are empty",
+    )
+    dte_ready = fields.Boolean(
+        string="Ready for DTE",
+        compute="_compute_dte_missing_fields",
+        store=True,
+    )
+
+    @api.depends(*DTE_PARTNER_FIELDS)
+    def _compute_dte_missing_fields(self):
+        for partner in self:
+            missing = [field_name for field_name in DTE_PARTNER_FIELDS if not partner[field_name]]
+            partner.dte_missing_fields = ",".join(missing)
+            partner.dte_ready = not missing
+
+    def _get_dte_missing_labels(self):
+        """Labels of the empty fields required by the DTEs, in the language of the user"""
+        self.ensure_one()
+        return ", ".join(
+            self._fields[field_name]._description_string(self.env)
+            for field_name in (self.dte_missing_fields or "").split(",")
+            if field_name
+        )
+
+    def write(self, vals):
+        res = super(Partner, self).write(vals)
+        if DTE_EMISOR_FIELDS.intersection(vals) and self.env["res.company"].sudo().search_count(
+            [("partner_id", "in", self.ids)]
+        ):
+            self.clear_caches()
+        return res
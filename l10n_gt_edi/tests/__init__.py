@@ -1 +1,8 @@
 from . import test_api
+from . import test_generate_dtes
+from . import test_allowed_type_ids
+from . import test_preflight
+from . import test_serializer
+from . import test_export
+from . import test_schema
+from . import test_dte_job
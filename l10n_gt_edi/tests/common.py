@@ -0,0 +1,85 @@
+from odoo.tests import TransactionCase
+
+
+class DteCommon(TransactionCase):
+    """Company, partners, taxes and products ready to build DTEs"""
+
+    def setUp(self):
+        super(DteCommon, self).setUp()
+        self.env.user.tz = "America/Guatemala"
+        self.state = self.env["res.country.state"].search(
+            [("country_id", "=", self.env.ref("base.gt").id)], limit=1
+        )
+        self.address = {
+            "street": "CIUDAD",
+            "zip": "01001",
+            "city": "GUATEMALA",
+            "state_id": self.state.id,
+            "country_id": self.env.ref("base.gt").id,
+        }
+        self.env.company.write(
+            dict(
+                self.address,
+                email="info@yourcompany.com",
+                vat="9847847",
+                company_registry="YourCompany, SOCIEDAD ANONIMA",
+                iva_affiliation_id=self.env.ref("l10n_gt_edi.gt_iva_affil_gen").id,
+                codigo_establecimiento=1,
+            )
+        )
+        self.journal = self.env["account.journal"].search(
+            [("type", "=", "sale"), ("company_id", "=", self.env.company.id)], limit=1
+        )
+        self.tax = self.env["account.tax"].create(
+            {
+                "name": "IVA 12%",
+                "amount": 12,
+                "type_tax_use": "sale",
+                "price_include": True,
+                "code_name": "IVA",
+                "codigo_unidad_gravable": 1,
+            }
+        )
+        self.products = self.env["product.product"].create(
+            [{"name": f"Product {index}", "type": "consu"} for index in range(3)]
+        )
+
+    def create_invoices(self, count, lines=3):
+        """Create draft invoices, each one for a new partner
+        Arguments:
+            count {int} -- Number of invoices
+            lines {int} -- Number of lines per invoice
+        Returns:
+            account.move -- The invoices
+        """
+        partners = self.env["res.partner"].create(
+            [
+                dict(self.address, name=f"Customer {index}", email="c@example.com", vat="CF")
+                for index in range(count)
+            ]
+        )
+        return self.env["account.move"].create(
+            [
+                {
+                    "move_type": "out_invoice",
+                    "partner_id": partner.id,
+                    "journal_id": self.journal.id,
+                    "dte_type_id": self.env.ref("l10n_gt_edi.gt_dte_type_fact").id,
+                    "invoice_line_ids": [
+                        (
+                            0,
+                            0,
+                            {
+                                "product_id": self.products[index % len(self.products)].id,
+                                "quantity": index + 1,
+                                "price_unit": 112.5,
+                                "discount": index % 2 * 10,
+                                "tax_ids": [(6, 0, self.tax.ids)],
+                            },
+                        )
+                        for index in range(lines)
+                    ],
+                }
+                for partner in partners
+            ]
+        )
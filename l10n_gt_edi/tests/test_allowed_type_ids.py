@@ -0,0 +1,29 @@
+from odoo.tests import tagged
+
+from .common import DteCommon
+
+
+@tagged("post_install", "-at_install")
+class AllowedTypeIdsTest(DteCommon):
+    def count_queries(self, moves):
+        moves.invalidate_cache(["allowed_type_ids"])
+        start = self.cr.sql_log_count
+        moves.mapped("allowed_type_ids")
+        return self.cr.sql_log_count - start
+
+    def test_allowed_types_by_move_type(self):
+        invoice = self.create_invoices(1)
+        self.assertIn(self.env.ref("l10n_gt_edi.gt_dte_type_fact"), invoice.allowed_type_ids)
+        self.assertEqual(set(invoice.allowed_type_ids.mapped("general_move_type")), {"invoice"})
+
+    def test_archived_type_is_not_allowed(self):
+        invoice = self.create_invoices(1)
+        self.env.ref("l10n_gt_edi.gt_dte_type_fcam").active = False
+        invoice.invalidate_cache(["allowed_type_ids"])
+        self.assertNotIn(self.env.ref("l10n_gt_edi.gt_dte_type_fcam"), invoice.allowed_type_ids)
+
+    def test_constant_query_count(self):
+        self.count_queries(self.create_invoices(1))
+        small_batch = self.count_queries(self.create_invoices(2, lines=1))
+        big_batch = self.count_queries(self.create_invoices(20, lines=1))
+        self.assertEqual(small_batch, big_batch)
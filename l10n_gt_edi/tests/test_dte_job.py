@@ -0,0 +1,21 @@
+from odoo.tests import tagged
+
+from .common import DteCommon
+
+
+@tagged("post_install", "-at_install")
+class DteJobTest(DteCommon):
+    def test_unposted_moves_are_not_certified(self):
+        self.journal.enable_sending_to_sat = True
+        moves = self.create_invoices(2, lines=1)
+        moves.with_context(dte_defer_certification=True).action_post()
+        jobs = self.env["gt.dte.job"].enqueue(moves)
+        moves[1].button_draft()
+        self.assertEqual(moves._filter_dte_to_certify(), moves[0])
+
+        acquired = self.env["gt.dte.job"]._acquire(1000)
+        self.assertIn(jobs.filtered(lambda job: job.move_id == moves[0]), acquired)
+        dropped = jobs.filtered(lambda job: job.move_id == moves[1])
+        self.assertNotIn(dropped, acquired)
+        self.assertEqual(dropped.state, "done")
+        self.assertTrue(dropped.last_error)
@@ -0,0 +1,66 @@
+import io
+import zipfile
+
+from odoo import fields
+from odoo.exceptions import ValidationError
+from odoo.tests import HttpCase, tagged
+
+from ..models import gt_dte_export
+from .common import DteCommon
+
+
+class ExportCommon(DteCommon):
+    def create_export(self):
+        """Export of today with two certified invoices, one of them annulled, and one that
+        isn't certified"""
+        moves = self.create_invoices(3, lines=1)
+        moves.with_context(dte_defer_certification=True).action_post()
+        for index, move in enumerate(moves[:2]):
+            info = {"invoice_id": move.id, "invoice_name": move.name, "fname": f"FACT_{index}.xml"}
+            move.generate_attachment_from_xml_string(f"<dte>{index}</dte>", info)
+            move.generate_certified_attachment_from_xml_string(
+                f"<dte certified='{index}'/>".encode()
+            )
+        moves[0].generate_annulated_attachment_from_xml_string(
+            "<anulacion/>",
+            {"invoice_id": moves[0].id, "invoice_name": moves[0].name, "fname": "ANUL_0.xml"},
+        )
+        return self.env["gt.dte.export"].create(
+            {"date_from": fields.Date.today(), "date_to": fields.Date.today()}
+        )
+
+    def assertExportZip(self, content):
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            names = archive.namelist()
+            self.assertEqual(len([name for name in names if name.startswith("certified/")]), 2)
+            self.assertEqual(len([name for name in names if name.startswith("annulled/")]), 1)
+            self.assertIn(
+                b"<dte certified='0'/>",
+                [archive.read(name) for name in names if name.startswith("certified/")],
+            )
+
+
+@tagged("post_install", "-at_install")
+class ExportTest(ExportCommon):
+    def test_zip_has_every_certified_xml(self):
+        export = self.create_export()
+        self.patch(gt_dte_export, "BATCH_SIZE", 1)
+        self.assertExportZip(b"".join(export._iter_zip()))
+
+    def test_dates_are_checked(self):
+        today = fields.Date.today()
+        with self.assertRaises(ValidationError):
+            self.env["gt.dte.export"].create(
+                {"date_from": today, "date_to": fields.Date.subtract(today, days=1)}
+            )
+
+
+@tagged("post_install", "-at_install")
+class ExportDownloadTest(ExportCommon, HttpCase):
+    def test_download_streams_the_zip(self):
+        export = self.create_export()
+        self.authenticate("admin", "admin")
+        response = self.url_open(f"/l10n_gt_edi/dte_export/{export.id}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["Content-Type"], "application/zip")
+        self.assertExportZip(response.content)
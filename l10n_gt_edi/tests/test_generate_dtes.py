@@ -0,0 +1,55 @@
+from odoo.tests import tagged
+
+from ..models.account_move import DIGITS
+from .common import DteCommon
+
+
+@tagged("post_install", "-at_install")
+class GenerateDtesTest(DteCommon):
+    def count_queries(self, moves):
+        moves.flush()
+        moves.invalidate_cache()
+        start = self.cr.sql_log_count
+        dtes = moves.generate_dtes()
+        self.assertEqual(len(dtes), len(moves))
+        return self.cr.sql_log_count - start
+
+    def test_dtes_match_single_generation(self):
+        moves = self.create_invoices(2)
+        dtes = moves.generate_dtes()
+        for move in moves:
+            self.assertEqual(dtes[move.id].emisor, move.generate_dte_emisor())
+            self.assertEqual(dtes[move.id].receptor, move.generate_dte_receptor())
+            self.assertEqual(dtes[move.id].items, move.generate_dte_items())
+
+    def test_constant_query_count(self):
+        # Fill the emisor and frases caches, they are shared by both batches
+        self.create_invoices(1).generate_dtes()
+        small_batch = self.count_queries(self.create_invoices(2))
+        big_batch = self.count_queries(self.create_invoices(10))
+        self.assertEqual(small_batch, big_batch)
+
+    def test_items_match_line_values(self):
+        other_tax = self.tax.copy({"name": "Tourism 10%", "amount": 10, "code_name": "TURISMO"})
+        service = self.env["product.product"].create({"name": "Service", "type": "service"})
+        moves = self.create_invoices(2, lines=30)
+        for index, line in enumerate(moves.mapped("invoice_line_ids")):
+            line.with_context(check_move_validity=False).write(
+                {
+                    "price_unit": 1000 / (index + 7),
+                    "discount": index % 3 * 12.5,
+                    "product_id": service.id if index % 4 == 0 else line.product_id.id,
+                    "tax_ids": [(6, 0, (self.tax | other_tax).ids if index % 5 == 0 else [])],
+                }
+            )
+        items_values = moves._get_dte_items_values()
+        dtes = moves.generate_dtes()
+        for move in moves:
+            expected = [move._get_dte_item_values(line) for line in move.invoice_line_ids]
+            self.assertEqual(items_values[move.id], expected)
+            for item, expected_item in zip(dtes[move.id].items, move.generate_dte_items()):
+                self.assertEqual(round(item.total, DIGITS), round(expected_item.total, DIGITS))
+                self.assertEqual(
+                    round(item.total_impuestos, DIGITS),
+                    round(expected_item.total_impuestos, DIGITS),
+                )
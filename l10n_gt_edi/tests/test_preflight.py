@@ -0,0 +1,66 @@
+from unittest.mock import patch
+
+from odoo.exceptions import ValidationError
+from odoo.tests import tagged
+
+from .common import DteCommon
+
+
+@tagged("post_install", "-at_install")
+class PreflightTest(DteCommon):
+    def test_ready_flags_follow_the_fields(self):
+        partner = self.create_invoices(1).partner_id
+        self.assertTrue(partner.dte_ready)
+        partner.zip = False
+        self.assertFalse(partner.dte_ready)
+        self.assertEqual(partner.dte_missing_fields, "zip")
+        self.assertTrue(self.env.company.dte_ready)
+        self.env.company.street = False
+        self.assertFalse(self.env.company.dte_ready)
+
+    def test_batch_reports_every_problem(self):
+        invoices = self.create_invoices(3, lines=1)
+        invoices[0].partner_id.email = False
+        invoices[2].partner_id.vat = False
+        problems = invoices._dte_preflight()
+        self.assertEqual(set(problems), {invoices[0], invoices[2]})
+
+        invoices.with_context(dte_defer_certification=True).action_post()
+        with self.assertRaises(ValidationError) as error:
+            invoices.check_dte_preflight()
+        self.assertIn(invoices[0].name, str(error.exception))
+        self.assertIn(invoices[2].name, str(error.exception))
+
+    def test_notes_and_missing_types(self):
+        invoices = self.create_invoices(2, lines=1)
+        invoices[0].write(
+            {"invoice_line_ids": [(0, 0, {"display_type": "line_note", "name": "Entregar hoy"})]}
+        )
+        invoices[1].dte_type_id = False
+        self.assertEqual(list(invoices._dte_preflight()), [invoices[1]])
+        self.assertEqual(len(invoices[0]._get_dte_items_values()[invoices[0].id]), 1)
+        self.assertEqual(len(invoices[0].generate_dte_items()), 1)
+
+    def test_move_that_cant_be_built_is_isolated(self):
+        self.journal.enable_sending_to_sat = True
+        invoices = self.create_invoices(3, lines=1)
+        invoices.with_context(dte_defer_certification=True).action_post()
+        broken = invoices[1]
+        Move = type(self.env["account.move"])
+        generate_xml_from_dte = Move.generate_xml_from_dte
+
+        def generate(move, dte):
+            if move == broken:
+                raise KeyError("broken")
+            return generate_xml_from_dte(move, dte)
+
+        def send(moves, prepare_method, process_method):
+            return {"done": moves, "failed": {}, "retry": {}}
+
+        with patch.object(Move, "generate_xml_from_dte", autospec=True, side_effect=generate):
+            with patch.object(Move, "_send_dte_batch", autospec=True, side_effect=send):
+                summary = invoices.certify_dte_bulk()
+        self.assertEqual(summary["done"], invoices - broken)
+        self.assertEqual(list(summary["failed"]), [broken])
+        self.assertTrue((invoices - broken).dte_xml_attachment_id)
+        self.assertFalse(broken.dte_xml_attachment_id)
@@ -0,0 +1,87 @@
+import os
+import tempfile
+from datetime import datetime
+from unittest.mock import patch
+
+from gt_sat_api import AnulacionDTE
+from gt_sat_api.parsers import dte_to_xml_annulled
+
+from odoo.exceptions import ValidationError
+from odoo.tests import tagged
+
+from .. import dte_schema
+from .common import DteCommon
+
+
+@tagged("post_install", "-at_install")
+class SchemaTest(DteCommon):
+    def setUp(self):
+        super(SchemaTest, self).setUp()
+        self.env["ir.config_parameter"].sudo().set_param("l10n_gt_edi.xsd_validation", "1")
+        self.journal.enable_sending_to_sat = True
+        self.moves = self.create_invoices(2, lines=2)
+        refund = self.create_invoices(1, lines=1)
+        refund.write(
+            {
+                "move_type": "out_refund",
+                "dte_type_id": self.env.ref("l10n_gt_edi.gt_dte_type_ncre").id,
+                "origin_uuid": "F7D5B9A3-1C2E-4B6A-9D8F-0E1A2B3C4D5E",
+                "origin_date": "2021-01-15",
+            }
+        )
+        self.moves |= refund
+        self.moves.with_context(dte_defer_certification=True).action_post()
+        self.moves.generate_dte_xml()
+
+    def test_valid_documents(self):
+        for move in self.moves:
+            self.assertEqual(dte_schema.validate(move.prepare_xml_to_sat(), "document"), [])
+            self.assertTrue(move.check_dte_schema(move.prepare_xml_to_sat()))
+
+    def test_valid_annulment(self):
+        move = self.moves[0]
+        annulment = AnulacionDTE(
+            uuid="F7D5B9A3-1C2E-4B6A-9D8F-0E1A2B3C4D5E",
+            fecha_hora_emision=datetime(2021, 1, 15, 10, 30),
+            fecha_hora_anulacion=datetime(2021, 1, 16, 9, 0),
+            motivo_anulacion="Error en el precio",
+            emisor=move.generate_dte_emisor(),
+            receptor=move.generate_dte_receptor(),
+        )
+        self.assertEqual(dte_schema.validate(dte_to_xml_annulled(annulment), "annulment"), [])
+        annulment.motivo_anulacion = " "
+        errors = dte_schema.validate(dte_to_xml_annulled(annulment), "annulment")
+        self.assertEqual(len(errors), 1)
+        self.assertRegex(errors[0], r"^Line \d+: .*MotivoAnulacion")
+
+    def test_invalid_document_is_rejected_before_sending(self):
+        invalid = self.moves[0]
+        xml = invalid.prepare_xml_to_sat().decode()
+        invalid.dte_xml_attachment_id.raw = xml.replace('Tipo="FACT"', 'Tipo="FACTURA"').encode()
+        with self.assertRaisesRegex(ValidationError, r"Line \d+: .*'Tipo'.*FACTURA"):
+            invalid._prepare_sat_request()
+
+    def test_without_schema(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with patch.object(dte_schema, "SCHEMA_DIR", directory):
+                dte_schema.clear_cache()
+                self.addCleanup(dte_schema.clear_cache)
+                self.assertEqual(dte_schema.validate(b"<Invalido/>", "document"), [])
+
+    def test_disabled_by_default(self):
+        invalid = self.moves[0]
+        invalid.dte_xml_attachment_id.raw = b"<Invalido/>"
+        self.env["ir.config_parameter"].sudo().set_param("l10n_gt_edi.xsd_validation", False)
+        self.assertTrue(invalid.check_dte_schema(invalid.prepare_xml_to_sat()))
+
+    def test_sat_schema_is_preferred(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, dte_schema.SCHEMA_FILES["document"][0]), "w") as xsd:
+                xsd.write(
+                    '<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema">'
+                    '<xs:element name="Sat"/></xs:schema>'
+                )
+            with patch.object(dte_schema, "SCHEMA_DIR", directory):
+                dte_schema.clear_cache()
+                self.addCleanup(dte_schema.clear_cache)
+                self.assertEqual(dte_schema.validate(b"<Sat/>", "document"), [])
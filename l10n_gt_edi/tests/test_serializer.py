@@ -0,0 +1,40 @@
+from gt_sat_api.parsers import dte_to_xml
+
+from odoo.tests import tagged
+
+from .. import dte_serializer
+from .common import DteCommon
+
+
+@tagged("post_install", "-at_install")
+class SerializerTest(DteCommon):
+    def test_same_xml_as_gt_sat_api(self):
+        invoices = self.create_invoices(3)
+        invoices[1].dte_type_id = self.env.ref("l10n_gt_edi.gt_dte_type_fpeq")
+        invoices[2].partner_id.name = 'Cliente "Ñandú" & <Hijos>'
+        refund = self.create_invoices(1, lines=2)
+        refund.write(
+            {
+                "move_type": "out_refund",
+                "dte_type_id": self.env.ref("l10n_gt_edi.gt_dte_type_ncre").id,
+                "origin_uuid": "F7D5B9A3-1C2E-4B6A-9D8F-0E1A2B3C4D5E",
+                "origin_date": "2021-01-15",
+            }
+        )
+        moves = invoices | refund
+        dtes = moves.generate_dtes()
+        dte_serializer.clear_cache()
+        for _round in range(2):  # the second round uses the cached emisor and frases
+            for move in moves:
+                self.assertEqual(
+                    dte_serializer.dte_to_xml(dtes[move.id]), dte_to_xml(dtes[move.id])
+                )
+
+    def test_selected_by_parameter(self):
+        invoice = self.create_invoices(1)
+        dte = invoice.generate_dte()
+        expected = dte_to_xml(dte)
+        for value in ("0", "1"):
+            self.env["ir.config_parameter"].set_param("l10n_gt_edi.fast_xml_serializer", value)
+            self.assertEqual(invoice._use_fast_dte_serializer(), value == "1")
+            self.assertEqual(invoice.generate_xml_from_dte(dte), expected)
@@ -1,16 +1,21 @@
 {
     "name": "L10N GT INFILE",  # TODO
-    "version": "14.0.0.1.0",  # TODO
+    "version": "14.0.0.3.0",  # TODO
     "author": "HomebrewSoft",
     "website": "https://homebrewsoft.dev",  # TODO
     "license": "LGPL-3",
     "depends": ["l10n_gt_edi"],
     "data": [  # TODO Check
         # security
+        "security/ir.model.access.csv",
         # data
+        "data/infile_status_counter.xml",
+        "data/ir_cron.xml",
         # reports
         # views
         "views/account_move.xml",
+        "views/infile_reconciliation.xml",
+        "views/infile_status_counter.xml",
         "views/res_company.xml",
     ],
 }
@@ -0,0 +1,327 @@
+"""HTTP client for INFILE reusing keep-alive connections between requests.
+
+The sessions live at process level, one per database and company, so the TLS handshake is
+paid once per connection of the pool instead of once per document. The credentials travel in
+the headers of each request, a session never holds them.
+
+Every company and endpoint also gets a circuit breaker and a token bucket, shared by the
+threads of the process. The breaker fails fast while INFILE is down instead of waiting for the
+timeout of each document, and the bucket keeps the requests under the throughput allowed by
+INFILE, halving its rate when INFILE answers that it's overloaded.
+"""
+import base64
+import io
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import requests
+from lxml import etree
+from requests.adapters import HTTPAdapter
+
+from gt_sat_infile_api.conection import URL_FEEL
+from gt_sat_infile_api.login import LoginHandler
+
+URL_PDF = "https://report.feel.com.gt/ingfacereport/ingfacereport_documento?uuid="
+POOL_SIZE = 16
+TIMEOUT = 60
+GT_TIMEZONE = timezone(timedelta(hours=-6))  # Guatemala has no daylight saving time
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+_breakers = {}
+_limiters = {}
+_guards_lock = threading.Lock()
+
+
+class CircuitOpenError(Exception):
+    """INFILE failed too many times in a row, the request wasn't sent"""
+
+
+class ServiceBusyError(Exception):
+    """INFILE answered that it's overloaded or unavailable"""
+
+
+# INFILE couldn't be reached, the document can be sent again later
+RETRY_ERRORS = (CircuitOpenError, ServiceBusyError, requests.RequestException)
+
+
+class CircuitBreaker:
+    """Stop calling a service after `threshold` consecutive failures. After `reset_timeout`
+    seconds one probe request is let through, its result closes or opens the circuit again"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, threshold=5, reset_timeout=60):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if self._probing or time.monotonic() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        """Whether a request can be sent now, taking the probe slot when the circuit is half open
+        Returns:
+            bool -- False if the request must not be sent
+        """
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+    def reset(self):
+        self.record_success()
+
+
+class TokenBucket:
+    """Let through at most `rate` requests per second, with bursts of up to `rate` requests.
+    The rate is halved on `slow_down` and grows back a tenth of the limit per `speed_up`"""
+
+    def __init__(self, rate):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.tokens = float(rate)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request can be sent"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def slow_down(self):
+        with self._lock:
+            self.rate = max(self.rate / 2, 0.1)
+            self.tokens = min(self.tokens, self.rate)
+
+    def speed_up(self):
+        with self._lock:
+            self.rate = min(self.rate + self.max_rate / 10, self.max_rate)
+
+
+def get_breaker(key, threshold=5, reset_timeout=60):
+    """Return the circuit breaker of a company and endpoint, updating its settings
+    Arguments:
+        key {tuple} -- (database name, company id, url)
+    Returns:
+        CircuitBreaker -- The breaker shared by the process
+    """
+    with _guards_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = _breakers[key] = CircuitBreaker(threshold, reset_timeout)
+        breaker.threshold = threshold
+        breaker.reset_timeout = reset_timeout
+        return breaker
+
+
+def get_limiter(key, rate):
+    """Return the token bucket of a company and endpoint
+    Arguments:
+        key {tuple} -- (database name, company id, url)
+        rate {float} -- Maximum requests per second, 0 for no limit
+    Returns:
+        TokenBucket -- The bucket shared by the process, None without limit
+    """
+    with _guards_lock:
+        if not rate:
+            _limiters.pop(key, None)
+            return None
+        limiter = _limiters.get(key)
+        if limiter is None or limiter.max_rate != rate:
+            limiter = _limiters[key] = TokenBucket(rate)
+        return limiter
+
+
+def get_session(key):
+    """Return the session of a company, creating it on first use
+    Arguments:
+        key {tuple} -- (database name, company id)
+    Returns:
+        requests.Session -- Session with a keep-alive connection pool
+    """
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[key] = session
+        return session
+
+
+def close_session(key):
+    """Drop the session of a company and close its connections
+    Arguments:
+        key {tuple} -- (database name, company id)
+    """
+    with _sessions_lock:
+        session = _sessions.pop(key, None)
+    if session is not None:
+        session.close()
+
+
+def generate_and_parse_query(session, auth_headers: LoginHandler, identifier: str, xml, url=URL_FEEL):
+    """Same as `gt_sat_infile_api.parser.generate_and_parse_query` but sent through `session`.
+    The certified xml is returned as bytes, ready to be stored without decoding it
+    Returns:
+        dict -- The parsed response
+    """
+    if isinstance(xml, str):
+        xml = xml.encode("UTF-8")
+    headers = {
+        "UsuarioFirma": auth_headers.user_sign,
+        "LlaveFirma": auth_headers.sign_key,
+        "UsuarioApi": auth_headers.user_api,
+        "LlaveApi": auth_headers.api_key,
+        "Identificador": str(identifier),
+        "Content-Type": "application/xml",
+    }
+    response = session.post(url=url, data=xml, headers=headers, timeout=TIMEOUT)
+    if response.status_code == 429 or response.status_code >= 500:
+        raise ServiceBusyError(f"INFILE answered {response.status_code}")
+    request_info = json.loads(response.text)
+    result = {}
+    if request_info["resultado"]:
+        result["res"] = True
+        result["xml"] = base64.b64decode(request_info["xml_certificado"])
+        result["date_certificate"] = request_info["fecha"]
+        result["uuid"] = request_info["uuid"]
+        result["series"] = request_info["serie"]
+        result["number"] = request_info["numero"]
+    else:
+        result["res"] = False
+        result["errors"] = request_info["descripcion_errores"]
+    return result
+
+
+def fetch_pdf(session, url):
+    """Download the PDF representation of a certified DTE
+    Arguments:
+        url {str} -- The PDF link of the document
+    Returns:
+        bytes -- The PDF
+    """
+    response = session.get(url=url, timeout=TIMEOUT)
+    if response.status_code == 429 or response.status_code >= 500:
+        raise ServiceBusyError(f"INFILE answered {response.status_code}")
+    if response.status_code != 200 or not response.content.startswith(b"%PDF"):
+        raise ValueError(f"INFILE didn't return a PDF for {url}")
+    return response.content
+
+
+def send_guarded(key, limits, func, *args, **kwargs):
+    """Call `func` through the circuit breaker and the token bucket of `key`
+    Arguments:
+        key {tuple} -- (database name, company id, url)
+        limits {dict} -- threshold, reset_timeout and rate of the company
+    Returns:
+        The result of `func`
+    """
+    breaker = get_breaker(key, limits["threshold"], limits["reset_timeout"])
+    if not breaker.allow():
+        raise CircuitOpenError("INFILE is unavailable, the document will be sent later")
+    limiter = get_limiter(key, limits["rate"])
+    if limiter:
+        limiter.acquire()
+    try:
+        result = func(*args, **kwargs)
+    except ServiceBusyError:
+        if limiter:
+            limiter.slow_down()
+        breaker.record_failure()
+        raise
+    except Exception:
+        # Any error counts, the probe slot of a half open circuit is released with it
+        breaker.record_failure()
+        raise
+    breaker.record_success()
+    if limiter:
+        limiter.speed_up()
+    return result
+
+
+def parse_datetime(value):
+    """Convert a datetime of INFILE to a naive UTC datetime, the ones without offset are in the
+    time of Guatemala
+    Returns:
+        datetime -- The datetime, None if it can't be read
+    """
+    try:
+        moment = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=GT_TIMEZONE)
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def parse_certification(xml):
+    """Read the certification data of a certified DTE with a streaming parser, it stops as
+    soon as the authorization and its date were found
+    Arguments:
+        xml {bytes} -- The certified xml
+    Returns:
+        dict -- uuid, series, number and certified_at, None for the missing ones
+    """
+    values = dict.fromkeys(("uuid", "series", "number", "certified_at"))
+    if isinstance(xml, str):
+        xml = xml.encode("UTF-8")
+    events = etree.iterparse(
+        io.BytesIO(xml),
+        events=("end",),
+        tag=("{*}NumeroAutorizacion", "{*}FechaHoraCertificacion"),
+        resolve_entities=False,
+        no_network=True,
+    )
+    try:
+        for _event, element in events:
+            if etree.QName(element).localname == "NumeroAutorizacion":
+                values["uuid"] = (element.text or "").strip() or None
+                values["series"] = element.get("Serie")
+                values["number"] = element.get("Numero")
+            else:
+                values["certified_at"] = parse_datetime(element.text)
+            if values["uuid"] and values["certified_at"]:
+                break
+    except etree.XMLSyntaxError:
+        pass
+    return values
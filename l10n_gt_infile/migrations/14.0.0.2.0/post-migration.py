@@ -0,0 +1,11 @@
+def migrate(cr, version):
+    """Before 14.0.0.2.0 the certified XML replaced the content of the XML sent to SAT"""
+    cr.execute(
+        """
+        UPDATE account_move
+        SET dte_certified_xml_attachment_id = dte_xml_attachment_id
+        WHERE dte_certified_xml_attachment_id IS NULL
+            AND infile_xml_uuid IS NOT NULL
+            AND infile_status IN ('done', 'annulled', 'annulled_error')
+        """
+    )
@@ -0,0 +1,3 @@
+def migrate(cr, version):
+    """Before 14.0.0.3.0 the INFILE status of drafts was empty"""
+    cr.execute("UPDATE account_move SET infile_status = 'not_sent' WHERE infile_status IS NULL")
@@ -1,3 +1,5 @@
 from . import account_move
 from . import account_move_reversal
 from . import res_company
+from . import infile_status_counter
+from . import infile_reconciliation
@@ -1,10 +1,27 @@
+import logging
+import time
 import uuid
-from datetime import datetime
-
-from gt_sat_infile_api.parser import generate_and_parse_query
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 
 from odoo import _, api, fields, models
 
+from .. import infile_client
+
+_logger = logging.getLogger(__name__)
+BACKFILL_BATCH_SIZE = 500
+BACKFILL_TIME_LIMIT = 240  # seconds
+BACKFILL_PARAM = "l10n_gt_infile.certification_backfill_last_id"
+PDF_CACHE_BATCH_SIZE = 50
+PDF_CACHE_TIME_LIMIT = 240  # seconds
+
+# move_type decides whether the move is counted at all
+COUNTER_FIELDS = {"company_id", "journal_id", "state", "infile_status", "move_type"}
+PARTIAL_INDEXES = {
+    "account_move_infile_pending_index": "infile_status = 'not_sent' AND state = 'posted'",
+    "account_move_infile_error_index": "infile_status IN ('error', 'annulled_error')",
+}
+
 
 class AccountMove(models.Model):
     _inherit = "account.move"
@@ -18,18 +35,34 @@ class AccountMove(models.Model):
             ("annulled_error", "Annulled Error"),
         ],
         string="INFILE status",
+        default="not_sent",
         copy=False,
         readonly=True,
+        index=True,
     )
     infile_certified_datetime = fields.Datetime(
         string="Certified at",
         copy=False,
         readonly=True,
+        index=True,
     )
     infile_xml_uuid = fields.Char(
         string="UUID",
         copy=False,
         readonly=True,
+        index=True,
+    )
+    infile_series = fields.Char(
+        string="Series",
+        copy=False,
+        readonly=True,
+        index=True,
+    )
+    infile_number = fields.Char(
+        string="Number",
+        copy=False,
+        readonly=True,
+        index=True,
     )
     infile_pdf_link = fields.Char(
         string="Link to pdf",
@@ -40,29 +73,159 @@ class AccountMove(models.Model):
         readonly=True,
         copy=False,
     )
+    infile_pdf_attachment_id = fields.Many2one(
+        comodel_name="ir.attachment",
+        string="INFILE PDF",
+        copy=False,
+        readonly=True,
+        ondelete="set null",
+    )
+
+    def init(self):
+        super(AccountMove, self).init()
+        for name, where in PARTIAL_INDEXES.items():
+            self.env.cr.execute(
+                f"CREATE INDEX IF NOT EXISTS {name} ON account_move (company_id, journal_id) "
+                f"WHERE {where}"
+            )
+
+    def _get_infile_counter_deltas(self, sign):
+        """Count the moves in their current state for the INFILE status counters
+        Arguments:
+            sign {int} -- 1 to add the moves, -1 to remove them
+        Returns:
+            dict -- {(company_id, journal_id, state, status): delta}
+        """
+        deltas = {}
+        for move in self.filtered(lambda move: move.is_invoice(include_receipts=True)):
+            key = (
+                move.company_id.id,
+                move.journal_id.id,
+                move.state,
+                move.infile_status or "not_sent",
+            )
+            deltas[key] = deltas.get(key, 0) + sign
+        return deltas
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        moves = super(AccountMove, self).create(vals_list)
+        self.env["infile.status.counter"].sudo()._apply(moves._get_infile_counter_deltas(1))
+        return moves
+
+    def write(self, vals):
+        if not COUNTER_FIELDS.intersection(vals):
+            return super(AccountMove, self).write(vals)
+        deltas = self._get_infile_counter_deltas(-1)
+        res = super(AccountMove, self).write(vals)
+        for key, delta in self._get_infile_counter_deltas(1).items():
+            deltas[key] = deltas.get(key, 0) + delta
+        self.env["infile.status.counter"].sudo()._apply(deltas)
+        return res
+
+    def unlink(self):
+        deltas = self._get_infile_counter_deltas(-1)
+        res = super(AccountMove, self).unlink()
+        self.env["infile.status.counter"].sudo()._apply(deltas)
+        return res
 
     @api.depends("infile_xml_uuid")
     def _compute_pdf_link(self):
         """Compute the link to the invoice pdf report"""
-        INFILE_PDF_LINK = "https://report.feel.com.gt/ingfacereport/ingfacereport_documento?uuid="
+        pdf_url = self._get_infile_pdf_url()
         for move in self:
-            move.infile_pdf_link = f"{INFILE_PDF_LINK}{move.infile_xml_uuid}"
+            move.infile_pdf_link = f"{pdf_url}{move.infile_xml_uuid}"
+
+    @api.model
+    def _get_infile_pdf_url(self):
+        """URL of the PDF of INFILE, followed by the UUID of the document"""
+        return (
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("l10n_gt_infile.pdf_url", infile_client.URL_PDF)
+        )
+
+    @api.model
+    def _get_infile_url(self):
+        """URL of the INFILE certification service, it can be changed to use a test server"""
+        return (
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("l10n_gt_infile.url", infile_client.URL_FEEL)
+        )
 
     def send_xml_to_sat(self):
         """Implemented Function to send the XML string to SAT through INFILE"""
-        login_handler = self.company_id.generate_login_handler()
-        xml_string = self.prepare_xml_to_sat()
-        self.infile_uuid = uuid.uuid1()
-        result = generate_and_parse_query(
-            auth_headers=login_handler,
-            identifier=self.infile_uuid,
-            xml=xml_string,
+        with self._dte_span("attachment"):
+            request = self._prepare_sat_request()
+        with self._dte_span("network"):
+            result = self._send_sat_request(request)
+        with self._dte_span("attachment"):
+            self._process_sat_response(result)
+        self._schedule_infile_pdf_cache()
+
+    def certify_dte_bulk(self):
+        summary = super(AccountMove, self).certify_dte_bulk()
+        summary["done"]._schedule_infile_pdf_cache()
+        return summary
+
+    def _is_sat_available(self):
+        return self.company_id._get_infile_breaker().state != infile_client.CircuitBreaker.OPEN
+
+    @api.model
+    def _get_sat_retry_errors(self):
+        return infile_client.RETRY_ERRORS
+
+    def _assign_sat_identifier(self):
+        """The identifier of a rejected document is replaced, INFILE didn't certify anything
+        with it and the new XML is a different document. The status goes back to not sent so
+        the new identifier survives a crash before the answer arrives, and the XML stored before
+        is dropped, it was never sent with the new identifier"""
+        for move in self:
+            if not move.infile_uuid or move.infile_status == "error":
+                move.dte_xml_attachment_id.sudo().unlink()
+                move.write({"infile_uuid": uuid.uuid1(), "infile_status": "not_sent"})
+        return True
+
+    def _reuses_sat_identifier(self):
+        self.ensure_one()
+        return bool(self.infile_uuid) and self.infile_status != "error"
+
+    def _prepare_sat_request(self):
+        request = super(AccountMove, self)._prepare_sat_request()
+        self._assign_sat_identifier()
+        request.update(
+            {
+                "auth_headers": self.company_id.generate_login_handler(),
+                "identifier": self.infile_uuid,
+                "session_key": self.company_id._get_infile_session_key(),
+                "url": self._get_infile_url(),
+                "limits": self.company_id._get_infile_limits(),
+            }
+        )
+        return request
+
+    @api.model
+    def _send_sat_request(self, request):
+        return infile_client.send_guarded(
+            request["session_key"] + (request["url"],),
+            request["limits"],
+            infile_client.generate_and_parse_query,
+            infile_client.get_session(request["session_key"]),
+            auth_headers=request["auth_headers"],
+            identifier=request["identifier"],
+            xml=request["xml"],
+            url=request["url"],
         )
+
+    def _process_sat_response(self, result):
+        self.ensure_one()
         if result["res"]:
             xml_certified = result["xml"]
-            self.infile_xml_uuid = result["uuid"]
-            self.generate_attachment_from_xml_string(xml_certified, {})
-            self.infile_status = "done"
+            self.generate_certified_attachment_from_xml_string(xml_certified)
+            values = self._get_certification_values(xml_certified, result)
+            values["infile_status"] = "done"
+            self.write(values)
         else:
             errors_list = [(error["mensaje_error"] + "\n") for error in result["errors"]]
             self.message_post(
@@ -70,18 +233,230 @@ class AccountMove(models.Model):
                 body="".join(errors_list),
             )
             self.infile_status = "error"
+        return bool(result["res"])
+
+    @api.model
+    def _get_certification_values(self, xml, result=None):
+        """Values of the certification read from the certified XML, the ones missing in it are
+        taken from the response of INFILE
+        Arguments:
+            xml {bytes} -- The certified xml
+            result {dict} -- The parsed response of INFILE
+        Returns:
+            dict -- Values to write on the move
+        """
+        parsed = infile_client.parse_certification(xml)
+        result = result or {}
+        certified_at = parsed["certified_at"]
+        if not certified_at and result.get("date_certificate"):
+            certified_at = infile_client.parse_datetime(result["date_certificate"])
+        return {
+            "infile_xml_uuid": parsed["uuid"] or result.get("uuid") or False,
+            "infile_series": parsed["series"] or result.get("series") or False,
+            "infile_number": parsed["number"] or str(result.get("number") or "") or False,
+            "infile_certified_datetime": certified_at or False,
+        }
+
+    @api.model
+    def _cron_backfill_certification_values(self):
+        """Fill the certification fields of the documents certified before they existed, from
+        their certified XML, in batches that are committed one by one"""
+        params = self.env["ir.config_parameter"].sudo()
+        last_id = int(params.get_param(BACKFILL_PARAM, 0))
+        deadline = time.monotonic() + BACKFILL_TIME_LIMIT
+        while time.monotonic() < deadline:
+            moves = self.search(
+                [
+                    ("id", ">", last_id),
+                    ("infile_xml_uuid", "!=", False),
+                    ("infile_certified_datetime", "=", False),
+                    ("dte_certified_xml_attachment_id", "!=", False),
+                ],
+                limit=BACKFILL_BATCH_SIZE,
+                order="id",
+            )
+            if not moves:
+                break
+            for move in moves:
+                values = self._get_certification_values(move.dte_certified_xml_attachment_id.raw)
+                move.write({key: value for key, value in values.items() if value})
+            last_id = moves[-1].id
+            params.set_param(BACKFILL_PARAM, last_id)
+            _logger.info("Certification values filled up to move %s", last_id)
+            self.env.cr.commit()
+            self.env.invalidate_all()
+
+    def _schedule_infile_pdf_cache(self):
+        """Wake up the download of the PDF of the certified moves whose company keeps them"""
+        if self.filtered(
+            lambda move: move.infile_status == "done" and move.company_id.infile_pdf_cache
+        ):
+            self.env.ref("l10n_gt_infile.ir_cron_cache_infile_pdf").sudo()._trigger()
+
+    def _cache_infile_pdf(self):
+        """Download the PDF of the moves from INFILE, concurrently per company, and keep them as
+        attachments. The downloads go through the circuit breaker and the rate limit of the
+        company, a PDF that couldn't be downloaded is tried again by the next run
+        Returns:
+            account.move -- The moves whose PDF was kept
+        """
+        cached = self.browse()
+        for company in self.company_id:
+            moves = self.filtered(lambda move: move.company_id == company)
+            session = infile_client.get_session(company._get_infile_session_key())
+            key = company._get_infile_pdf_key()
+            limits = company._get_infile_limits()
+            workers = max(company.dte_certification_workers, 1)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    (
+                        move,
+                        executor.submit(
+                            infile_client.send_guarded,
+                            key,
+                            limits,
+                            infile_client.fetch_pdf,
+                            session,
+                            move.infile_pdf_link,
+                        ),
+                    )
+                    for move in moves
+                ]
+                downloads = []
+                for move, future in futures:
+                    try:
+                        downloads.append((move, future.result()))
+                    except Exception as error:
+                        _logger.warning("Couldn't download the PDF of %s: %s", move.name, error)
+            attachments = (
+                self.env["ir.attachment"]
+                .sudo()
+                .create(
+                    [
+                        {
+                            "name": f"{move.name.replace('/', '_')}.pdf",
+                            "raw": pdf,
+                            "res_model": "account.move",
+                            "res_id": move.id,
+                            "type": "binary",
+                            "mimetype": "application/pdf",
+                        }
+                        for move, pdf in downloads
+                    ]
+                )
+            )
+            for (move, _pdf), attachment in zip(downloads, attachments):
+                move.infile_pdf_attachment_id = attachment
+                cached |= move
+        return cached
+
+    @api.model
+    def _evict_infile_pdf_cache(self, companies):
+        """Remove the PDF kept longer than the days of their company, then the oldest ones
+        until the PDF of each company fit in its cache size
+        Returns:
+            int -- Number of PDF removed
+        """
+        to_remove = []
+        for company in companies:
+            self.env.cr.execute(
+                """
+                SELECT a.id, a.file_size, a.create_date
+                FROM account_move m
+                JOIN ir_attachment a ON a.id = m.infile_pdf_attachment_id
+                WHERE m.company_id = %s
+                ORDER BY a.create_date DESC, a.id DESC
+                """,
+                (company.id,),
+            )
+            oldest = fields.Datetime.now() - timedelta(days=company.infile_pdf_cache_days)
+            max_size = company.infile_pdf_cache_size * 1024 * 1024
+            size = 0
+            for attachment_id, file_size, create_date in self.env.cr.fetchall():
+                size += file_size or 0
+                if create_date < oldest or size > max_size:
+                    to_remove.append(attachment_id)
+        if to_remove:
+            _logger.info("Removing %s PDF from the INFILE cache", len(to_remove))
+            self.env["ir.attachment"].sudo().browse(to_remove).unlink()
+            self.invalidate_cache(["infile_pdf_attachment_id"])
+        return len(to_remove)
+
+    @api.model
+    def _cron_cache_infile_pdf(self):
+        """Download the PDF of the recently certified documents of the companies that keep them,
+        in batches that are committed one by one, and evict the old ones"""
+        companies = self.env["res.company"].search([("infile_pdf_cache", "=", True)])
+        deadline = time.monotonic() + PDF_CACHE_TIME_LIMIT
+        for company in companies:
+            last_id = 0
+            since = fields.Datetime.now() - timedelta(days=company.infile_pdf_cache_days)
+            breaker = company._get_infile_pdf_breaker()
+            while (
+                time.monotonic() < deadline and breaker.state != infile_client.CircuitBreaker.OPEN
+            ):
+                moves = self.search(
+                    [
+                        ("id", ">", last_id),
+                        ("company_id", "=", company.id),
+                        ("infile_status", "=", "done"),
+                        ("infile_pdf_attachment_id", "=", False),
+                        ("infile_certified_datetime", ">=", since),
+                    ],
+                    limit=PDF_CACHE_BATCH_SIZE,
+                    order="id",
+                )
+                if not moves:
+                    break
+                moves._cache_infile_pdf()
+                last_id = moves[-1].id
+                self.env.cr.commit()
+        self._evict_infile_pdf_cache(companies)
+        self.env.cr.commit()
+
+    def action_print_infile_pdf(self):
+        """Open the PDF kept for the move, or the one of INFILE. While the downloads from INFILE
+        are failing the invoice report is printed instead, so documents can be reprinted
+        without INFILE"""
+        self.ensure_one()
+        if self.infile_pdf_attachment_id:
+            return {
+                "type": "ir.actions.act_url",
+                "url": f"/web/content/{self.infile_pdf_attachment_id.id}?download=true",
+                "target": "new",
+            }
+        breaker = self.company_id._get_infile_pdf_breaker()
+        if breaker.state != infile_client.CircuitBreaker.OPEN:
+            self._schedule_infile_pdf_cache()
+            return {"type": "ir.actions.act_url", "url": self.infile_pdf_link, "target": "new"}
+        return self.env.ref("account.account_invoices").report_action(self)
 
     def send_xml_annulated_to_sat(self):
         """Implemented Function to send the XML string to SAT through INFILE"""
-        login_handler = self.company_id.generate_login_handler()
-        xml_string = self.prepare_xml_annulated_to_sat()
-        if isinstance(xml_string, str):
-            xml_string = xml_string.encode("UTF-8")
-        result = generate_and_parse_query(
-            auth_headers=login_handler,
-            identifier=self.infile_xml_uuid,
-            xml=xml_string,
+        with self._dte_span("attachment"):
+            request = self._prepare_sat_annulment_request()
+        with self._dte_span("network"):
+            result = self._send_sat_request(request)
+        with self._dte_span("attachment"):
+            self._process_sat_annulment_response(result)
+
+    def _prepare_sat_annulment_request(self):
+        request = super(AccountMove, self)._prepare_sat_annulment_request()
+        if isinstance(request["xml"], str):
+            request["xml"] = request["xml"].encode("UTF-8")
+        request.update(
+            {
+                "auth_headers": self.company_id.generate_login_handler(),
+                "identifier": self.infile_xml_uuid,
+                "session_key": self.company_id._get_infile_session_key(),
+                "url": self._get_infile_url(),
+                "limits": self.company_id._get_infile_limits(),
+            }
         )
+        return request
+
+    def _process_sat_annulment_response(self, result):
+        self.ensure_one()
         if result["res"]:
             xml_certified = result["xml"]
             self.infile_xml_uuid = result["uuid"]
@@ -94,3 +469,4 @@ class AccountMove(models.Model):
                 body="".join(errors_list),
             )
             self.infile_status = "annulled_error"
+        return bool(result["res"])
@@ -0,0 +1,179 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from odoo import api, fields, models
+from odoo.exceptions import UserError
+
+from .. import infile_client
+
+import logging
+
+_logger = logging.getLogger(__name__)
+BATCH_SIZE = 200
+TIME_LIMIT = 240  # seconds a cron run keeps checking batches
+LAST_ID_PARAM = "l10n_gt_infile.reconcile_last_id"
+
+
+class InfileReconciliation(models.Model):
+    """Log of the documents whose status was settled against INFILE. INFILE has no service to
+    query the status of a document, so they are checked by sending them again with their
+    identifier, that INFILE answers with its first answer. It settles the documents left
+    without answer and the ones rejected locally but certified by INFILE. Duplicated
+    certifications and annulments made outside of Odoo can't be seen that way and aren't
+    reconciled"""
+
+    _name = "infile.reconciliation"
+    _description = "INFILE Reconciliation"
+    _order = "id desc"
+
+    move_id = fields.Many2one(
+        comodel_name="account.move",
+        required=True,
+        ondelete="cascade",
+        index=True,
+        readonly=True,
+    )
+    company_id = fields.Many2one(
+        related="move_id.company_id",
+        store=True,
+    )
+    kind = fields.Selection(
+        [
+            ("certified", "Certified by INFILE"),
+            ("rejected", "Rejected by INFILE"),
+            ("error_certified", "Certified by INFILE, rejected locally"),
+        ],
+        required=True,
+        readonly=True,
+    )
+    infile_xml_uuid = fields.Char(string="UUID", readonly=True)
+
+    @api.model
+    def _get_settings(self):
+        """Reconciliation settings, from system parameters. The rate and the workers are small
+        so certifications keep the bandwidth of INFILE
+        Returns:
+            dict -- rate, workers, delay (minutes) and days
+        """
+        params = self.env["ir.config_parameter"].sudo()
+        return {
+            "rate": float(params.get_param("l10n_gt_infile.reconcile_rate", 2)),
+            "workers": max(int(params.get_param("l10n_gt_infile.reconcile_workers", 2)), 1),
+            "delay": int(params.get_param("l10n_gt_infile.reconcile_delay", 15)),
+            "days": int(params.get_param("l10n_gt_infile.reconcile_days", 30)),
+        }
+
+    @api.model
+    def _get_moves_domain(self, settings):
+        """Posted moves sent with an identifier whose answer was never saved or was saved as a
+        rejection, untouched for `delay` minutes so the ones being certified right now are left
+        alone"""
+        now = fields.Datetime.now()
+        return [
+            ("state", "=", "posted"),
+            ("infile_uuid", "!=", False),
+            ("infile_status", "in", ("not_sent", "error")),
+            ("journal_id.enable_sending_to_sat", "=", True),
+            ("write_date", "<=", now - timedelta(minutes=settings["delay"])),
+            ("write_date", ">=", now - timedelta(days=settings["days"])),
+        ]
+
+    @api.model
+    def _cron_reconcile(self):
+        """Settle the documents left without answer in batches, continuing from the last one
+        checked by the previous run"""
+        settings = self._get_settings()
+        params = self.env["ir.config_parameter"].sudo()
+        last_id = int(params.get_param(LAST_ID_PARAM, 0))
+        deadline = time.monotonic() + TIME_LIMIT
+        while time.monotonic() < deadline:
+            moves = self.env["account.move"].search(
+                self._get_moves_domain(settings) + [("id", ">", last_id)],
+                limit=BATCH_SIZE,
+                order="id",
+            )
+            last_id = moves[-1].id if moves else 0
+            params.set_param(LAST_ID_PARAM, last_id)
+            if moves:
+                self._reconcile_moves(moves, settings)
+            self.env.cr.commit()
+            if not moves:
+                break
+
+    @api.model
+    def _replay_moves(self, moves, settings):
+        """Send again the XML of the moves with the identifier they were sent with. INFILE
+        answers a repeated identifier with the document it already certified, or rejected,
+        instead of certifying it again. The requests go concurrently under the rate limit of
+        the reconciliation, and companies whose certifications are paused aren't checked
+        Returns:
+            dict -- Response of INFILE by move, moves that couldn't be checked are left out
+        """
+        requests = []
+        for move in moves.filtered(lambda move: move._is_sat_available()):
+            try:
+                request = move._prepare_sat_request()
+            except UserError as error:
+                _logger.warning("Couldn't check %s in INFILE: %s", move.name, error)
+                continue
+            request["limits"] = dict(request["limits"], rate=settings["rate"])
+            # Own limiter, the one of the certifications keeps its rate
+            request["guard_key"] = request["session_key"] + (request["url"], "reconciliation")
+            requests.append((move, request))
+
+        def replay(request):
+            return infile_client.send_guarded(
+                request["guard_key"],
+                request["limits"],
+                infile_client.generate_and_parse_query,
+                infile_client.get_session(request["session_key"]),
+                auth_headers=request["auth_headers"],
+                identifier=request["identifier"],
+                xml=request["xml"],
+                url=request["url"],
+            )
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=settings["workers"]) as executor:
+            futures = [(move, executor.submit(replay, request)) for move, request in requests]
+            for move, future in futures:
+                try:
+                    results[move] = future.result()
+                except Exception as error:
+                    _logger.warning("Couldn't check %s in INFILE: %s", move.name, error)
+        return results
+
+    @api.model
+    def _reconcile_moves(self, moves, settings):
+        """Save the answer of INFILE for the moves left without one, with the certified XML, and
+        for the rejected moves INFILE certified, and log them. Moves waiting in the job queue
+        are left to it
+        Returns:
+            infile.reconciliation -- The settled moves
+        """
+        queued = self.env["gt.dte.job"].search(
+            [("move_id", "in", moves.ids), ("state", "in", ("pending", "running"))]
+        )
+        moves = (moves - queued.move_id).filtered(
+            lambda move: move.infile_uuid and move.infile_status in ("not_sent", "error")
+        )
+        settled = []
+        for move, result in self._replay_moves(moves, settings).items():
+            if move.infile_status == "error":
+                if not result["res"]:
+                    continue  # Rejected by INFILE too, nothing to settle
+                kind = "error_certified"
+            else:
+                kind = "certified" if result["res"] else "rejected"
+            move._process_sat_response(result)
+            settled.append(
+                {
+                    "move_id": move.id,
+                    "kind": kind,
+                    "infile_xml_uuid": move.infile_xml_uuid,
+                }
+            )
+        if settled:
+            _logger.info("INFILE reconciliation: %s documents settled", len(settled))
+        return self.create(settled)
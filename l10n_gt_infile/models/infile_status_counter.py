@@ -0,0 +1,128 @@
+from odoo import api, fields, models
+
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class InfileStatusCounter(models.Model):
+    _name = "infile.status.counter"
+    _description = "INFILE Status Counter"
+    _log_access = False
+    _order = "company_id, journal_id, state, status"
+
+    company_id = fields.Many2one(comodel_name="res.company", readonly=True, required=True)
+    journal_id = fields.Many2one(comodel_name="account.journal", readonly=True, required=True)
+    state = fields.Selection(
+        [
+            ("draft", "Draft"),
+            ("posted", "Posted"),
+            ("cancel", "Cancelled"),
+        ],
+        readonly=True,
+        required=True,
+    )
+    status = fields.Selection(
+        selection=lambda self: self.env["account.move"]._fields["infile_status"].selection,
+        string="INFILE status",
+        readonly=True,
+        required=True,
+    )
+    count = fields.Integer(readonly=True)
+
+    _sql_constraints = [
+        (
+            "key_unique",
+            "UNIQUE(company_id, journal_id, state, status)",
+            "There can only be one counter per company, journal, state and status",
+        ),
+    ]
+
+    @api.model
+    def _apply(self, deltas):
+        """Record the deltas of a transaction. They are only inserted, so concurrent
+        transactions don't wait on the rows of the counters, and added to the counters later
+        by `_fold`
+        Arguments:
+            deltas {dict} -- {(company_id, journal_id, state, status): delta}
+        """
+        rows = [key + (delta,) for key, delta in deltas.items() if delta]
+        if not rows:
+            return
+        self.env.cr.execute(
+            """
+            INSERT INTO infile_status_counter_delta (company_id, journal_id, state, status, delta)
+            VALUES {}
+            """.format(
+                ", ".join(["(%s, %s, %s, %s, %s)"] * len(rows))
+            ),
+            [value for row in rows for value in row],
+        )
+
+    @api.model
+    def _fold(self):
+        """Add the recorded deltas to the counters and remove them. The counters are updated in
+        the order of their key, so two folds can't deadlock"""
+        self.env.cr.execute(
+            """
+            WITH folded AS (
+                DELETE FROM infile_status_counter_delta
+                RETURNING company_id, journal_id, state, status, delta
+            )
+            INSERT INTO infile_status_counter (company_id, journal_id, state, status, count)
+            SELECT company_id, journal_id, state, status, SUM(delta)
+            FROM folded
+            GROUP BY company_id, journal_id, state, status
+            HAVING SUM(delta) != 0
+            ORDER BY company_id, journal_id, state, status
+            ON CONFLICT (company_id, journal_id, state, status)
+            DO UPDATE SET count = infile_status_counter.count + EXCLUDED.count
+            """
+        )
+        self.invalidate_cache(["count"])
+
+    @api.model
+    def _rebuild(self):
+        """Count the documents again from scratch"""
+        self.env["account.move"].flush(
+            ["company_id", "journal_id", "state", "infile_status", "move_type"]
+        )
+        self.env.cr.execute(
+            """
+            DELETE FROM infile_status_counter_delta;
+            DELETE FROM infile_status_counter;
+            INSERT INTO infile_status_counter (company_id, journal_id, state, status, count)
+            SELECT company_id, journal_id, state, COALESCE(infile_status, 'not_sent'), COUNT(*)
+            FROM account_move
+            WHERE move_type IN %s
+            GROUP BY company_id, journal_id, state, COALESCE(infile_status, 'not_sent')
+            """,
+            [tuple(self.env["account.move"].get_invoice_types(include_receipts=True))],
+        )
+        self.invalidate_cache()
+        _logger.info("INFILE status counters rebuilt")
+
+
+class InfileStatusCounterDelta(models.Model):
+    _name = "infile.status.counter.delta"
+    _description = "INFILE Status Counter Delta"
+    _log_access = False
+
+    company_id = fields.Many2one(
+        comodel_name="res.company", readonly=True, required=True, ondelete="cascade"
+    )
+    journal_id = fields.Many2one(
+        comodel_name="account.journal", readonly=True, required=True, ondelete="cascade"
+    )
+    state = fields.Selection(
+        selection=lambda self: self.env["infile.status.counter"]._fields["state"].selection,
+        readonly=True,
+        required=True,
+    )
+    status = fields.Selection(
+        selection=lambda self: self.env["account.move"]._fields["infile_status"].selection,
+        string="INFILE status",
+        readonly=True,
+        required=True,
+    )
+    delta = fields.Integer(readonly=True)
@@ -1,7 +1,16 @@
 from gt_sat_infile_api.login import LoginHandler
-from odoo import fields, models, _
+from odoo import api, fields, models, tools, _
 from odoo.exceptions import ValidationError
 
+from .. import infile_client
+
+INFILE_CREDENTIAL_FIELDS = {
+    "infile_user_sign",
+    "infile_sign_key",
+    "infile_user_api",
+    "infile_api_key",
+}
+
 
 class Company(models.Model):
     _inherit = "res.company"
@@ -10,19 +19,125 @@ class Company(models.Model):
     infile_sign_key = fields.Char(string="Token Firma")
     infile_user_api = fields.Char(string="Usuario")
     infile_api_key = fields.Char(string="Llave")
+    infile_breaker_threshold = fields.Integer(
+        string="Failures before pausing",
+        default=5,
+        help="Consecutive INFILE failures after which the documents are queued without trying "
+        "to send them",
+    )
+    infile_breaker_timeout = fields.Integer(
+        string="Pause (seconds)",
+        default=60,
+        help="Time to wait before trying INFILE again after a pause",
+    )
+    infile_rate_limit = fields.Float(
+        string="Requests per second",
+        default=10,
+        help="Maximum requests per second sent to INFILE by each server process, 0 for no limit",
+    )
+    infile_pdf_cache = fields.Boolean(
+        string="Keep the PDF of INFILE",
+        help="Download the PDF of the certified documents in background and keep it as an "
+        "attachment, so they are printed without calling INFILE",
+    )
+    infile_pdf_cache_days = fields.Integer(
+        string="Keep PDF for (days)",
+        default=90,
+        help="The PDF downloaded longer ago are removed",
+    )
+    infile_pdf_cache_size = fields.Integer(
+        string="PDF cache size (MB)",
+        default=1024,
+        help="The oldest PDF are removed when the ones of the company take more space",
+    )
+    infile_service_state = fields.Selection(
+        [
+            (infile_client.CircuitBreaker.CLOSED, "Available"),
+            (infile_client.CircuitBreaker.OPEN, "Paused"),
+            (infile_client.CircuitBreaker.HALF_OPEN, "Retrying"),
+        ],
+        string="INFILE service",
+        compute="_compute_infile_service_state",
+    )
+    infile_service_failures = fields.Integer(
+        string="Consecutive failures",
+        compute="_compute_infile_service_state",
+    )
+
+    def _compute_infile_service_state(self):
+        """State of the circuit breaker of this server process"""
+        for company in self:
+            breaker = company._get_infile_breaker()
+            company.infile_service_state = breaker.state
+            company.infile_service_failures = breaker.failures
+
+    def write(self, vals):
+        res = super(Company, self).write(vals)
+        if INFILE_CREDENTIAL_FIELDS.intersection(vals):
+            for company in self:
+                infile_client.close_session(company._get_infile_session_key())
+            self.clear_caches()
+        return res
 
     def generate_login_handler(self):
+        return self._get_login_handler(self.id)
+
+    @api.model
+    @tools.ormcache("company_id")
+    def _get_login_handler(self, company_id):
+        """Build the login handler of a company once, until its credentials change"""
+        company = self.browse(company_id)
         if not (
-            self.infile_user_sign
-            and self.infile_sign_key
-            and self.infile_user_api
-            and self.infile_api_key
+            company.infile_user_sign
+            and company.infile_sign_key
+            and company.infile_user_api
+            and company.infile_api_key
         ):
             raise ValidationError(_("Login credentials not found"))
         login_handler = LoginHandler(
-            user_sign=self.infile_user_sign,
-            sign_key=self.infile_sign_key,
-            user_api=self.infile_user_api,
-            api_key=self.infile_api_key,
+            user_sign=company.infile_user_sign,
+            sign_key=company.infile_sign_key,
+            user_api=company.infile_user_api,
+            api_key=company.infile_api_key,
         )
         return login_handler
+
+    def _get_infile_session_key(self):
+        """Key of the process level HTTP session of the company"""
+        self.ensure_one()
+        return (self.env.cr.dbname, self.id)
+
+    def _get_infile_limits(self):
+        """Circuit breaker and rate limit settings of the company"""
+        self.ensure_one()
+        return {
+            "threshold": max(self.infile_breaker_threshold, 1),
+            "reset_timeout": max(self.infile_breaker_timeout, 1),
+            "rate": max(self.infile_rate_limit, 0),
+        }
+
+    def _get_infile_breaker(self):
+        self.ensure_one()
+        limits = self._get_infile_limits()
+        return infile_client.get_breaker(
+            self._get_infile_session_key() + (self.env["account.move"]._get_infile_url(),),
+            limits["threshold"],
+            limits["reset_timeout"],
+        )
+
+    def _get_infile_pdf_key(self):
+        """Key of the circuit breaker and rate limit of the PDF downloads of the company"""
+        self.ensure_one()
+        return self._get_infile_session_key() + (self.env["account.move"]._get_infile_pdf_url(),)
+
+    def _get_infile_pdf_breaker(self):
+        self.ensure_one()
+        limits = self._get_infile_limits()
+        return infile_client.get_breaker(
+            self._get_infile_pdf_key(), limits["threshold"], limits["reset_timeout"]
+        )
+
+    def action_reset_infile_service(self):
+        """Close the circuit breaker to send the documents right away"""
+        for company in self:
+            company._get_infile_breaker().reset()
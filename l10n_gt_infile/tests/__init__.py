@@ -1 +1,8 @@
 from . import test_account_move
+from . import test_benchmark
+from . import test_status_counter
+from . import test_infile_client
+from . import test_reconciliation
+from . import test_pdf_cache
+from . import test_dte_stats
+from . import test_certification
@@ -0,0 +1,143 @@
+"""Local stand-in of the INFILE certification service for tests and benchmarks"""
+import base64
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CERTIFICATION = """<dte:Certificacion>
+        <dte:NITCertificador>12521337</dte:NITCertificador>
+        <dte:NombreCertificador>INFILE, S.A.</dte:NombreCertificador>
+        <dte:NumeroAutorizacion Numero="{number}" Serie="{series}">{uuid}</dte:NumeroAutorizacion>
+        <dte:FechaHoraCertificacion>{date}</dte:FechaHoraCertificacion>
+      </dte:Certificacion>
+    """
+PDF = b"%%PDF-1.4\n%% Representacion grafica %s\n%%%%EOF\n"
+
+
+class InfileMockServer:
+    """HTTP server answering like the INFILE unified endpoint. Documents and annulments are
+    told apart by the root element of the xml, and a repeated identifier gets the response
+    given the first time. The PDF of the certified documents is answered at `pdf_url`
+
+    Arguments:
+        latency {float} -- Seconds waited before answering each request
+        error_rate {float} -- Fraction of requests answered with a certification error
+        seed {int} -- Seed of the random errors, to get repeatable runs
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.requests = []
+        self.responses = {}
+        self.certified = set()
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}/fel/procesounificado/transaccion/v2/xml"
+
+    @property
+    def pdf_url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}/ingfacereport/ingfacereport_documento?uuid="
+
+    def start(self):
+        self.thread.start()
+        return self.url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def respond(self, identifier, xml):
+        """Build the response of a request
+        Arguments:
+            identifier {str} -- Identificador header
+            xml {str} -- Body of the request
+        Returns:
+            dict -- The JSON response
+        """
+        with self.lock:
+            self.requests.append(identifier)
+            if identifier in self.responses:
+                return self.responses[identifier]
+            failed = self.random.random() < self.error_rate
+        time.sleep(self.latency)
+        if failed:
+            return {
+                "resultado": False,
+                "descripcion_errores": [{"mensaje_error": "Error simulado por el servidor local"}],
+            }
+        certified_uuid = str(uuid.uuid4()).upper()
+        series = certified_uuid[:8]
+        number = int(certified_uuid[9:18].replace("-", ""), 16)
+        date = datetime.now().replace(microsecond=0).isoformat()
+        if "GTAnulacionDocumento" not in xml:
+            xml = xml.replace(
+                "</dte:DTE>",
+                CERTIFICATION.format(number=number, series=series, uuid=certified_uuid, date=date)
+                + "</dte:DTE>",
+            )
+        response = {
+            "resultado": True,
+            "fecha": date,
+            "uuid": certified_uuid,
+            "serie": series,
+            "numero": number,
+            "xml_certificado": base64.b64encode(xml.encode()).decode(),
+        }
+        with self.lock:
+            self.responses[identifier] = response
+            if "GTAnulacionDocumento" not in xml:
+                self.certified.add(certified_uuid)
+        return response
+
+    def _make_handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"])).decode()
+                payload = json.dumps(mock.respond(self.headers["Identificador"], body)).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                certified_uuid = self.path.partition("uuid=")[2]
+                with mock.lock:
+                    mock.requests.append(certified_uuid)
+                    found = certified_uuid in mock.certified
+                if not found:
+                    self.send_error(404)
+                    return
+                payload = PDF % certified_uuid.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/pdf")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
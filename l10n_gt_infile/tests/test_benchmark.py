@@ -0,0 +1,115 @@
+"""Throughput benchmark of the certification pipeline against a local INFILE stand-in.
+
+It doesn't run with the standard tests, select it with `--test-tags fel_benchmark`. The size of
+the run is set with the environment variables FEL_BENCH_INVOICES, FEL_BENCH_LINES,
+FEL_BENCH_LATENCY (seconds) and FEL_BENCH_ERROR_RATE, and the results are written as JSON to
+FEL_BENCH_OUTPUT when it is set.
+"""
+import json
+import os
+import time
+
+from odoo.tests import tagged
+
+from odoo.addons.l10n_gt_edi.tests.common import DteCommon
+
+from .infile_mock import InfileMockServer
+
+import logging
+
+_logger = logging.getLogger(__name__)
+INVOICES = int(os.environ.get("FEL_BENCH_INVOICES", 20))
+LINES = int(os.environ.get("FEL_BENCH_LINES", 5))
+LATENCY = float(os.environ.get("FEL_BENCH_LATENCY", 0.05))
+ERROR_RATE = float(os.environ.get("FEL_BENCH_ERROR_RATE", 0.0))
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+@tagged("post_install", "-at_install", "-standard", "fel_benchmark")
+class CertificationBenchmark(DteCommon):
+    def setUp(self):
+        super(CertificationBenchmark, self).setUp()
+        self.env.company.write(
+            {
+                "infile_user_sign": "BENCH",
+                "infile_sign_key": "BENCH",
+                "infile_user_api": "BENCH",
+                "infile_api_key": "BENCH",
+            }
+        )
+        self.journal.enable_sending_to_sat = True
+        self.server = InfileMockServer(latency=LATENCY, error_rate=ERROR_RATE, seed=0)
+        self.env["ir.config_parameter"].sudo().set_param("l10n_gt_infile.url", self.server.start())
+        self.addCleanup(self.server.stop)
+        self.results = {
+            "invoices": INVOICES,
+            "lines": LINES,
+            "latency": LATENCY,
+            "error_rate": ERROR_RATE,
+            "stages": {},
+        }
+
+    def create_posted_invoices(self, count):
+        moves = self.create_invoices(count, LINES)
+        moves.with_context(dte_defer_certification=True).action_post()
+        moves.flush()
+        moves.invalidate_cache()
+        return moves
+
+    def measure(self, stage, function):
+        queries = self.cr.sql_log_count
+        start = time.perf_counter()
+        result = function()
+        self.env["account.move"].flush()
+        self.results["stages"][stage] = {
+            "seconds": time.perf_counter() - start,
+            "queries": self.cr.sql_log_count - queries,
+        }
+        return result
+
+    def write_attachments(self, moves, dtes, xmls):
+        for move in moves:
+            info = {
+                "invoice_id": move.id,
+                "invoice_name": move.name,
+                "fname": dtes[move.id].tipo + "_" + move.name + ".xml",
+            }
+            move.generate_attachment_from_xml_string(xmls[move.id], info)
+
+    def test_certification_throughput(self):
+        moves = self.create_posted_invoices(INVOICES)
+        dtes = self.measure("build", moves.generate_dtes)
+        xmls = self.measure(
+            "serialize",
+            lambda: {move.id: move.generate_xml_from_dte(dtes[move.id]) for move in moves},
+        )
+        self.measure("attachments", lambda: self.write_attachments(moves, dtes, xmls))
+        moves.invalidate_cache()
+        summary = self.measure("certify_bulk", moves.certify_dte_bulk)
+
+        latencies = []
+        for move in self.create_posted_invoices(min(INVOICES, 10)):
+            start = time.perf_counter()
+            move.call_generate_and_send_xml()
+            latencies.append(time.perf_counter() - start)
+        self.results["certify_single"] = {
+            "p50": percentile(latencies, 0.5),
+            "p95": percentile(latencies, 0.95),
+            "max": max(latencies),
+        }
+        self.results["certified"] = len(summary["done"])
+        self.results["failed"] = len(summary["failed"])
+        self.results["requests"] = len(self.server.requests)
+
+        output = json.dumps(self.results, sort_keys=True)
+        _logger.info("FEL benchmark: %s", output)
+        if os.environ.get("FEL_BENCH_OUTPUT"):
+            with open(os.environ["FEL_BENCH_OUTPUT"], "w") as bench_file:
+                bench_file.write(output + "\n")
+        self.assertEqual(len(summary["done"]) + len(summary["failed"]), INVOICES)
+        if not ERROR_RATE:
+            self.assertEqual(set(moves.mapped("infile_status")), {"done"})
@@ -0,0 +1,91 @@
+from unittest.mock import patch
+
+from odoo.addons.l10n_gt_edi.tests.common import DteCommon
+
+from .infile_mock import InfileMockServer
+
+
+class TestCertification(DteCommon):
+    def setUp(self):
+        super(TestCertification, self).setUp()
+        self.env.company.write(
+            {
+                "infile_user_sign": "TEST",
+                "infile_sign_key": "TEST",
+                "infile_user_api": "TEST",
+                "infile_api_key": "TEST",
+            }
+        )
+        self.journal.enable_sending_to_sat = True
+        self.server = InfileMockServer()
+        self.env["ir.config_parameter"].sudo().set_param("l10n_gt_infile.url", self.server.start())
+        self.addCleanup(self.server.stop)
+        self.moves = self.create_invoices(2, lines=1)
+        self.moves.with_context(dte_defer_certification=True).action_post()
+
+    def test_retry_resends_the_stored_xml(self):
+        Move = type(self.env["account.move"])
+        with patch.object(
+            Move,
+            "_send_sat_requests",
+            autospec=True,
+            side_effect=lambda moves, requests: [TimeoutError("timeout")] * len(requests),
+        ):
+            summary = self.moves.certify_dte_bulk()
+        self.assertEqual(set(summary["retry"]), set(self.moves))
+        sent = {
+            move: (move.infile_uuid, move.emision_datetime, move.dte_xml_attachment_id.raw)
+            for move in self.moves
+        }
+
+        with patch.object(Move, "generate_dtes", autospec=True) as generate_dtes:
+            summary = self.moves.certify_dte_bulk()
+        generate_dtes.assert_not_called()
+        self.assertEqual(summary["done"], self.moves)
+        for move, (identifier, emision_datetime, xml) in sent.items():
+            self.assertEqual(move.infile_uuid, identifier)
+            self.assertEqual(move.emision_datetime, emision_datetime)
+            self.assertEqual(move.dte_xml_attachment_id.raw, xml)
+
+    def test_rejected_document_is_rebuilt(self):
+        move = self.moves[0]
+        self.server.error_rate = 1.0
+        move.certify_dte_bulk()
+        self.assertEqual(move.infile_status, "error")
+        identifier, attachment = move.infile_uuid, move.dte_xml_attachment_id
+
+        self.server.error_rate = 0.0
+        self.assertEqual(move.certify_dte_bulk()["done"], move)
+        self.assertNotEqual(move.infile_uuid, identifier)
+        self.assertFalse(attachment.exists())
+        self.assertTrue(move.dte_xml_attachment_id)
+
+    def test_unreachable_inline_certification_is_queued(self):
+        move = self.create_invoices(1, lines=1)
+        self.addCleanup(self.env.company._get_infile_breaker().reset)
+        self.server.stop()
+        move.action_post()
+        self.assertEqual(move.state, "posted")
+        self.assertEqual(move.infile_status, "not_sent")
+        job = self.env["gt.dte.job"].search([("move_id", "=", move.id)])
+        self.assertEqual(job.state, "pending")
+
+    def test_annulment_that_cant_be_built_is_isolated(self):
+        self.moves.certify_dte_bulk()
+        self.moves.write({"annulment_reason": "Anulada por pruebas"})
+        broken = self.moves[0]
+        Move = type(self.env["account.move"])
+        generate_annulate_xml_from_dte = Move.generate_annulate_xml_from_dte
+
+        def generate(move, dte):
+            if move == broken:
+                raise KeyError("broken")
+            return generate_annulate_xml_from_dte(move, dte)
+
+        with patch.object(
+            Move, "generate_annulate_xml_from_dte", autospec=True, side_effect=generate
+        ):
+            summary = self.moves.annul_dte_bulk()
+        self.assertEqual(summary["done"], self.moves - broken)
+        self.assertEqual(list(summary["failed"]), [broken])
+        self.assertEqual(broken.infile_status, "done")
@@ -0,0 +1,45 @@
+from odoo.addons.l10n_gt_edi.tests.common import DteCommon
+
+from .infile_mock import InfileMockServer
+
+
+class TestDteStats(DteCommon):
+    def setUp(self):
+        super(TestDteStats, self).setUp()
+        self.env.company.write(
+            {
+                "infile_user_sign": "TEST",
+                "infile_sign_key": "TEST",
+                "infile_user_api": "TEST",
+                "infile_api_key": "TEST",
+            }
+        )
+        self.journal.enable_sending_to_sat = True
+        self.server = InfileMockServer(latency=0.01)
+        self.env["ir.config_parameter"].sudo().set_param("l10n_gt_infile.url", self.server.start())
+        self.addCleanup(self.server.stop)
+
+    def _get_stats(self, moves, operation):
+        return self.env["gt.dte.stats"].search(
+            [("move_id", "in", moves.ids), ("operation", "=", operation)]
+        )
+
+    def test_bulk_and_queued_batches_are_timed(self):
+        moves = self.create_invoices(3, lines=2)
+        moves.with_context(dte_defer_certification=True).action_post()
+        moves.certify_dte_bulk()
+        stats = self._get_stats(moves, "certify")
+        self.assertEqual(stats.move_id, moves)
+        for stat in stats:
+            self.assertGreater(stat.network_ms, 0)
+            self.assertGreater(stat.serialize_ms, 0)
+            self.assertGreaterEqual(stat.total_ms, stat.network_ms + stat.serialize_ms)
+
+        moves.write({"annulment_reason": "Anulada por pruebas"})
+        self.env["gt.dte.job"].enqueue(moves, job_type="annul")
+        self.env["gt.dte.job"].process(auto_commit=False)
+        self.assertEqual(set(moves.mapped("infile_status")), {"annulled"})
+        stats = self._get_stats(moves, "annul")
+        self.assertEqual(stats.move_id, moves)
+        for stat in stats:
+            self.assertGreater(stat.network_ms, 0)
@@ -0,0 +1,113 @@
+import time
+from datetime import datetime
+
+from odoo.tests.common import BaseCase
+
+from .. import infile_client
+from .infile_mock import CERTIFICATION
+
+
+class TestCircuitBreaker(BaseCase):
+    def _send(self, key, func):
+        limits = {"threshold": 2, "reset_timeout": 0.05, "rate": 0}
+        return infile_client.send_guarded(key, limits, func)
+
+    def test_opens_after_threshold_and_probes(self):
+        key = ("test", 1, "http://localhost/breaker")
+        calls = []
+
+        def busy():
+            calls.append(1)
+            raise infile_client.ServiceBusyError("503")
+
+        for _attempt in range(2):
+            with self.assertRaises(infile_client.ServiceBusyError):
+                self._send(key, busy)
+        with self.assertRaises(infile_client.CircuitOpenError):
+            self._send(key, busy)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(infile_client.get_breaker(key, 2, 0.05).state, "open")
+
+        time.sleep(0.06)
+        self.assertEqual(self._send(key, lambda: "ok"), "ok")
+        self.assertEqual(infile_client.get_breaker(key, 2, 0.05).state, "closed")
+
+    def test_failed_probe_opens_again(self):
+        key = ("test", 1, "http://localhost/probe")
+
+        def busy():
+            raise infile_client.ServiceBusyError("503")
+
+        for _attempt in range(2):
+            with self.assertRaises(infile_client.ServiceBusyError):
+                self._send(key, busy)
+        time.sleep(0.06)
+        with self.assertRaises(infile_client.ServiceBusyError):
+            self._send(key, busy)
+        with self.assertRaises(infile_client.CircuitOpenError):
+            self._send(key, busy)
+
+    def test_unexpected_error_releases_the_probe(self):
+        key = ("test", 1, "http://localhost/unexpected")
+
+        def busy():
+            raise infile_client.ServiceBusyError("503")
+
+        for _attempt in range(2):
+            with self.assertRaises(infile_client.ServiceBusyError):
+                self._send(key, busy)
+        time.sleep(0.06)
+        with self.assertRaises(KeyError):
+            self._send(key, lambda: {}["resultado"])
+        self.assertEqual(infile_client.get_breaker(key, 2, 0.05).state, "open")
+        time.sleep(0.06)
+        self.assertEqual(self._send(key, lambda: "ok"), "ok")
+
+
+class TestTokenBucket(BaseCase):
+    def test_rate(self):
+        bucket = infile_client.TokenBucket(20)
+        start = time.monotonic()
+        for _request in range(30):
+            bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.45)
+
+    def test_slow_down_and_recover(self):
+        bucket = infile_client.TokenBucket(10)
+        bucket.slow_down()
+        self.assertEqual(bucket.rate, 5)
+        for _response in range(10):
+            bucket.speed_up()
+        self.assertEqual(bucket.rate, 10)
+
+
+class TestParseCertification(BaseCase):
+    def test_certified_xml(self):
+        certification = CERTIFICATION.format(
+            number="1234567",
+            series="A1B2C3D4",
+            uuid="A1B2C3D4-0012-D687-8A1B-2C3D4E5F6A7B",
+            date="2021-03-10T11:45:23-06:00",
+        )
+        xml = (
+            '<dte:GTDocumento xmlns:dte="http://www.sat.gob.gt/dte/fel/0.2.0"><dte:SAT>'
+            f"<dte:DTE><dte:DatosEmision/>{certification}</dte:DTE></dte:SAT></dte:GTDocumento>"
+        ).encode()
+        self.assertEqual(
+            infile_client.parse_certification(xml),
+            {
+                "uuid": "A1B2C3D4-0012-D687-8A1B-2C3D4E5F6A7B",
+                "series": "A1B2C3D4",
+                "number": "1234567",
+                "certified_at": datetime(2021, 3, 10, 17, 45, 23),
+            },
+        )
+
+    def test_missing_certification(self):
+        for xml in (b"<dte:GTDocumento xmlns:dte='x'/>", b"not xml"):
+            self.assertEqual(set(infile_client.parse_certification(xml).values()), {None})
+
+    def test_datetime_without_offset_is_guatemala_time(self):
+        self.assertEqual(
+            infile_client.parse_datetime("2021-03-10T11:45:23"), datetime(2021, 3, 10, 17, 45, 23)
+        )
@@ -0,0 +1,60 @@
+from odoo.addons.l10n_gt_edi.tests.common import DteCommon
+
+from .infile_mock import InfileMockServer
+
+
+class TestPdfCache(DteCommon):
+    def setUp(self):
+        super(TestPdfCache, self).setUp()
+        self.env.company.write(
+            {
+                "infile_user_sign": "TEST",
+                "infile_sign_key": "TEST",
+                "infile_user_api": "TEST",
+                "infile_api_key": "TEST",
+                "infile_pdf_cache": True,
+            }
+        )
+        self.journal.enable_sending_to_sat = True
+        self.server = InfileMockServer()
+        params = self.env["ir.config_parameter"].sudo()
+        params.set_param("l10n_gt_infile.url", self.server.start())
+        params.set_param("l10n_gt_infile.pdf_url", self.server.pdf_url)
+        self.addCleanup(self.server.stop)
+        self.addCleanup(self.env.company._get_infile_pdf_breaker().reset)
+        self.moves = self.create_invoices(3, lines=1)
+        self.moves.with_context(dte_defer_certification=True).action_post()
+        self.moves.certify_dte_bulk()
+
+    def test_pdf_is_kept_and_evicted(self):
+        cached = self.moves._cache_infile_pdf()
+        self.assertEqual(cached, self.moves)
+        for move in self.moves:
+            self.assertTrue(move.infile_pdf_attachment_id.raw.startswith(b"%PDF"))
+            self.assertIn(move.infile_xml_uuid.encode(), move.infile_pdf_attachment_id.raw)
+        action = self.moves[0].action_print_infile_pdf()
+        self.assertIn(f"/web/content/{self.moves[0].infile_pdf_attachment_id.id}", action["url"])
+
+        old = self.moves[0].infile_pdf_attachment_id
+        self.env.cr.execute(
+            "UPDATE ir_attachment SET create_date = create_date - interval '100 days' "
+            "WHERE id = %s",
+            (old.id,),
+        )
+        old.invalidate_cache()
+        self.assertEqual(self.env["account.move"]._evict_infile_pdf_cache(self.env.company), 1)
+        self.assertFalse(old.exists())
+        self.assertFalse(self.moves[0].infile_pdf_attachment_id)
+        self.assertTrue(self.moves[1].infile_pdf_attachment_id)
+
+        self.env.company.infile_pdf_cache_size = 0
+        self.assertEqual(self.env["account.move"]._evict_infile_pdf_cache(self.env.company), 2)
+        self.assertFalse(self.moves.infile_pdf_attachment_id)
+
+    def test_local_report_while_infile_is_down(self):
+        self.server.certified.clear()  # INFILE answers 404 for every PDF
+        self.env.company.infile_breaker_threshold = 1
+        self.assertFalse(self.moves[:1]._cache_infile_pdf())
+        action = self.moves[0].action_print_infile_pdf()
+        self.assertEqual(action["type"], "ir.actions.report")
+        self.assertEqual(action["report_name"], "account.report_invoice_with_payments")
@@ -0,0 +1,72 @@
+from odoo.addons.l10n_gt_edi.tests.common import DteCommon
+
+from .infile_mock import InfileMockServer
+
+
+class TestReconciliation(DteCommon):
+    def setUp(self):
+        super(TestReconciliation, self).setUp()
+        self.env.company.write(
+            {
+                "infile_user_sign": "TEST",
+                "infile_sign_key": "TEST",
+                "infile_user_api": "TEST",
+                "infile_api_key": "TEST",
+            }
+        )
+        self.journal.enable_sending_to_sat = True
+        self.server = InfileMockServer()
+        self.env["ir.config_parameter"].sudo().set_param("l10n_gt_infile.url", self.server.start())
+        self.addCleanup(self.server.stop)
+        self.settings = dict(self.env["infile.reconciliation"]._get_settings(), delay=0, rate=0)
+
+    def test_unanswered_documents_are_settled(self):
+        moves = self.create_invoices(4, lines=1)
+        moves.with_context(dte_defer_certification=True).action_post()
+        certified, lost, queued, unsent = moves
+        certified.certify_dte_bulk()
+        moves.generate_dte_xml()
+        moves._assign_sat_identifier()
+        # Certified by INFILE after the answer was lost to a timeout
+        self.server.respond(lost.infile_uuid, lost.prepare_xml_to_sat().decode())
+        certified_uuid = self.server.responses[lost.infile_uuid]["uuid"]
+        self.env["gt.dte.job"].enqueue(queued)
+
+        domain = self.env["infile.reconciliation"]._get_moves_domain(self.settings)
+        candidates = self.env["account.move"].search(domain + [("id", "in", moves.ids)])
+        self.assertEqual(candidates, lost | queued | unsent)
+
+        settled = self.env["infile.reconciliation"]._reconcile_moves(candidates, self.settings)
+        self.assertEqual(settled.move_id, lost | unsent)
+        self.assertEqual(set(settled.mapped("kind")), {"certified"})
+        self.assertEqual(lost.infile_status, "done")
+        self.assertEqual(lost.infile_xml_uuid, certified_uuid)
+        self.assertTrue(lost.dte_certified_xml_attachment_id)
+        self.assertIn(certified_uuid.encode(), lost.dte_certified_xml_attachment_id.raw)
+        self.assertEqual(queued.infile_status, "not_sent")
+        # Sent once before the timeout and replayed once, INFILE certified it only once
+        self.assertEqual(self.server.requests.count(lost.infile_uuid), 2)
+
+        self.assertFalse(self.env["infile.reconciliation"]._reconcile_moves(moves, self.settings))
+
+    def test_rejected_documents_certified_by_infile_are_settled(self):
+        moves = self.create_invoices(2, lines=1)
+        moves.with_context(dte_defer_certification=True).action_post()
+        drifted, rejected = moves
+        moves.generate_dte_xml()
+        # Certified by INFILE, the answer was saved as a rejection
+        self.server.respond(drifted.infile_uuid, drifted.prepare_xml_to_sat().decode())
+        self.server.responses[rejected.infile_uuid] = {
+            "resultado": False,
+            "descripcion_errores": [{"mensaje_error": "NIT del receptor invalido"}],
+        }
+        moves.write({"infile_status": "error"})
+
+        domain = self.env["infile.reconciliation"]._get_moves_domain(self.settings)
+        self.assertEqual(self.env["account.move"].search(domain + [("id", "in", moves.ids)]), moves)
+        settled = self.env["infile.reconciliation"]._reconcile_moves(moves, self.settings)
+        self.assertEqual(settled.move_id, drifted)
+        self.assertEqual(settled.kind, "error_certified")
+        self.assertEqual(drifted.infile_status, "done")
+        self.assertTrue(drifted.dte_certified_xml_attachment_id)
+        self.assertEqual(rejected.infile_status, "error")
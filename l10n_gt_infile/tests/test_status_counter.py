@@ -0,0 +1,45 @@
+from odoo.addons.l10n_gt_edi.tests.common import DteCommon
+
+
+class TestStatusCounter(DteCommon):
+    def _get_counts(self):
+        self.env["infile.status.counter"]._fold()
+        counters = self.env["infile.status.counter"].search(
+            [("journal_id", "=", self.journal.id), ("count", "!=", 0)]
+        )
+        return {(counter.state, counter.status): counter.count for counter in counters}
+
+    def test_counters_follow_the_moves(self):
+        before = self._get_counts()
+        moves = self.create_invoices(3, lines=1)
+        counts = self._get_counts()
+        self.assertEqual(counts[("draft", "not_sent")], before.get(("draft", "not_sent"), 0) + 3)
+
+        moves.with_context(dte_defer_certification=True).action_post()
+        moves[0].infile_status = "error"
+        moves[1].infile_status = "done"
+        counts = self._get_counts()
+        self.assertEqual(counts[("draft", "not_sent")], before.get(("draft", "not_sent"), 0))
+        self.assertEqual(
+            counts[("posted", "not_sent")], before.get(("posted", "not_sent"), 0) + 1
+        )
+        self.assertEqual(counts[("posted", "error")], before.get(("posted", "error"), 0) + 1)
+        self.assertEqual(counts[("posted", "done")], before.get(("posted", "done"), 0) + 1)
+
+        self.env["infile.status.counter"]._rebuild()
+        self.assertEqual(self._get_counts(), counts)
+
+    def test_deltas_are_folded(self):
+        before = self._get_counts()
+        moves = self.create_invoices(2, lines=1)
+        deltas = self.env["infile.status.counter.delta"].search(
+            [("journal_id", "=", self.journal.id)]
+        )
+        self.assertEqual(sum(deltas.mapped("delta")), 2)
+
+        moves[0].write({"move_type": "entry"})
+        counts = self._get_counts()
+        self.assertEqual(counts[("draft", "not_sent")], before.get(("draft", "not_sent"), 0) + 1)
+        self.assertFalse(
+            self.env["infile.status.counter.delta"].search([("journal_id", "=", self.journal.id)])
+        )
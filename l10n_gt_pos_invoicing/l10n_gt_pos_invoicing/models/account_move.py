@@ -5,6 +5,32 @@ class AccountMove(models.Model):
     _inherit = "account.move"
 
     motivo_anulacion = fields.Text()
+    dte_contingency = fields.Boolean(
+        string="Issued in contingency",
+        copy=False,
+        readonly=True,
+        help="Posted before SAT certified it, a provisional receipt was given to the customer",
+    )
+
+    def _mark_dte_contingency(self):
+        """Flag the moves left in the certification queue, because of the contingency mode or
+        because SAT couldn't be reached. Moves rejected by SAT aren't flagged, they wait for
+        their data to be fixed instead of a certification"""
+        queued = (
+            self.env["gt.dte.job"]
+            .sudo()
+            .search(
+                [
+                    ("move_id", "in", self.ids),
+                    ("job_type", "=", "certify"),
+                    ("state", "in", ("pending", "running")),
+                ]
+            )
+        )
+        (self & queued.move_id).filtered(
+            lambda move: move.state == "posted" and move.infile_status != "done"
+        ).write({"dte_contingency": True})
 
     def retry_annulation(self):
-        return super(AccountMove, self).call_generate_and_send_xml_annulated()
+        self._enqueue_dte_annulment()
+        return True
@@ -18,3 +18,8 @@ class PosConfig(models.Model):
         string="Tipo de DTE",
         default=_default_dte_type,
     )
+    dte_contingency_mode = fields.Boolean(
+        string="Certify later",
+        help="Post the invoices without waiting for SAT and print a provisional receipt. "
+        "The invoices are certified in the background by the certification queue",
+    )
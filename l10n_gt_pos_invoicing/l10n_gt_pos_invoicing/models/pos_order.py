@@ -1,4 +1,7 @@
+from collections import defaultdict
+
 from odoo import api, fields, models, _
+from odoo.exceptions import UserError
 
 
 class PosOrder(models.Model):
@@ -11,6 +14,23 @@ class PosOrder(models.Model):
     def get_account_move_infile_xml_uuid(self):
         return self.account_move.infile_xml_uuid
 
+    def get_account_move_dte_info(self):
+        return {
+            "uuid": self.account_move.infile_xml_uuid,
+            "contingency": self.account_move.dte_contingency,
+        }
+
+    def action_pos_order_invoice(self):
+        if not any(self.mapped("session_id.config_id.dte_contingency_mode")):
+            res = super(PosOrder, self).action_pos_order_invoice()
+        else:
+            res = super(
+                PosOrder, self.with_context(dte_defer_certification=True)
+            ).action_pos_order_invoice()
+            self.mapped("account_move")._enqueue_dte_certification()
+        self.mapped("account_move")._mark_dte_contingency()
+        return res
+
     def _prepare_invoice_vals(self):
         invoice_vals = super(PosOrder, self)._prepare_invoice_vals()
         invoice_vals["dte_type_id"] = (self.session_id.config_id.dte_type_id.id,)
@@ -18,3 +38,64 @@ class PosOrder(models.Model):
             self.journal_id.id or self.session_id.config_id.invoice_journal_id.id,
         )
         return invoice_vals
+
+    def _create_invoices_batch(self):
+        """Batched `_create_invoice`: one create per company and move type. The invoices are
+        linked to their order with the standard origin message
+        Returns:
+            dict -- Invoice by order
+        """
+        vals_by_group = defaultdict(list)
+        for order in self:
+            vals = order._prepare_invoice_vals()
+            vals_by_group[(order.company_id, vals["move_type"])].append((order, vals))
+        invoices = {}
+        for (company, move_type), orders_vals in vals_by_group.items():
+            moves = (
+                self.env["account.move"]
+                .sudo()
+                .with_company(company)
+                .with_context(default_move_type=move_type)
+                .create([vals for order, vals in orders_vals])
+            )
+            for (order, vals), move in zip(orders_vals, moves):
+                move.message_post_with_view(
+                    "mail.message_origin_link",
+                    values={"self": move, "origin": order},
+                    subtype_id=self.env.ref("mail.mt_note").id,
+                )
+                invoices[order] = move
+        return invoices
+
+    def _invoice_orders_batch(self):
+        """Invoice the orders together: one create per company and type, one post and one
+        concurrent certification batch. Orders with cash rounding are created one by one by the
+        standard `_create_invoice`, that adds the rounding lines
+        Returns:
+            dict -- Batch summary, see `account.move._send_dte_batch`
+        """
+        to_invoice = self.filtered(lambda order: not order.account_move)
+        if to_invoice.filtered(lambda order: not order.partner_id):
+            raise UserError(_("Please provide a partner for the sale."))
+        batched = to_invoice.filtered(lambda order: not order.config_id.cash_rounding)
+        invoices = batched._create_invoices_batch()
+        for order in to_invoice - batched:
+            invoices[order] = order._create_invoice(order._prepare_invoice_vals())
+        moves = self.env["account.move"]
+        for order, move in invoices.items():
+            order.write({"account_move": move.id, "state": "invoiced"})
+            moves |= move
+        for company in moves.mapped("company_id"):
+            moves.filtered(lambda move: move.company_id == company).sudo().with_company(
+                company
+            ).with_context(dte_defer_certification=True)._post()
+
+        contingency = to_invoice.filtered(
+            lambda order: order.config_id.dte_contingency_mode
+        ).mapped("account_move")
+        contingency._enqueue_dte_certification()
+        summary = (moves - contingency).sudo().certify_dte_bulk()
+        retry = self.env["account.move"].browse([move.id for move in summary["retry"]])
+        retry._enqueue_dte_certification()
+        moves._mark_dte_contingency()
+        return summary
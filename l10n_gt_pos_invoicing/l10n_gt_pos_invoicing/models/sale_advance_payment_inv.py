@@ -6,10 +6,26 @@ class SaleAdvancePaymentInv(models.TransientModel):
     _inherit = "sale.advance.payment.inv"
 
     def create_invoices(self):
-        res = super(SaleAdvancePaymentInv, self).create_invoices()
         sale_orders = self.env["sale.order"].browse(self._context.get("active_ids", []))
-        for sale in sale_orders:
-            for invoices in sale.invoice_ids:
-                if invoices.infile_status == "not_sent":
-                    invoices.action_post()
+        previous_invoices = sale_orders.mapped("invoice_ids")
+        res = super(SaleAdvancePaymentInv, self).create_invoices()
+        invoices = (sale_orders.mapped("invoice_ids") - previous_invoices).filtered(
+            lambda invoice: invoice.state == "draft"
+        )
+        if invoices:
+            invoices.with_context(dte_defer_certification=True).action_post()
+            summary = invoices.certify_dte_bulk()
+            for invoice, reason in summary["failed"].items():
+                invoice.message_post(
+                    body=_("The invoice was rejected, correct it and certify it again: %s")
+                    % reason
+                )
+            for invoice, reason in summary["retry"].items():
+                invoice.message_post(
+                    body=_("SAT couldn't be reached, the invoice was left in the queue: %s")
+                    % reason
+                )
+            self.env["account.move"].browse(
+                [invoice.id for invoice in summary["retry"]]
+            )._enqueue_dte_certification()
         return res
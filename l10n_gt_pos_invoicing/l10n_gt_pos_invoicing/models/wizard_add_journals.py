@@ -1,4 +1,3 @@
-from typing import ValuesView
 from odoo import _, api, fields, models
 
 
@@ -12,15 +11,9 @@ class wizard_add_journals(models.TransientModel):
 
     def action_pos_order_invoice(self):
         sales = self.env["pos.order"].browse(self.env.context["active_ids"])
-        for record in sales:
-            record.journal_id = self.journal_id.id
-            if not record.partner_id:
-                partner = self.env["res.partner"].search(
-                    [
-                        ("id", "=", "res_partner_cf_gt"),
-                    ]
-                )
-                record.partner_id = partner
-            res = record.action_pos_order_invoice()
-            res["target"] = ""
-        return
+        sales.write({"journal_id": self.journal_id.id})
+        sales.filtered(lambda record: not record.partner_id).write(
+            {"partner_id": self.env.ref("l10n_gt_pos_invoicing.res_partner_cf_gt").id}
+        )
+        summary = sales._invoice_orders_batch()
+        return self.env["account.move"]._get_dte_batch_notification(summary)
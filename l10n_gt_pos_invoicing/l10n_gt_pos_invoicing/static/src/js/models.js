@@ -11,11 +11,11 @@ odoo.define("pos_ticket_invoice_customer", function (require) {
 
             await rpc.query({
                 model: 'pos.order',
-                method: 'get_account_move_infile_xml_uuid',
+                method: 'get_account_move_dte_info',
                 args: [order_id],
-            }).then(function (uuid) {
-                order.infile_xml_uuid = uuid;
-                console.log(uuid)
+            }).then(function (info) {
+                order.infile_xml_uuid = info.uuid;
+                order.dte_contingency = info.contingency;
             });
 
             return order_id;
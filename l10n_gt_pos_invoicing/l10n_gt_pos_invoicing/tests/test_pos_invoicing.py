@@ -0,0 +1,135 @@
+from unittest.mock import patch
+
+from odoo.tests import tagged
+
+from odoo.addons.l10n_gt_edi.tests.common import DteCommon
+from odoo.addons.l10n_gt_infile.tests.infile_mock import InfileMockServer
+
+
+@tagged("post_install", "-at_install")
+class TestPosInvoicing(DteCommon):
+    def setUp(self):
+        super(TestPosInvoicing, self).setUp()
+        self.env.company.write(
+            {
+                "infile_user_sign": "TEST",
+                "infile_sign_key": "TEST",
+                "infile_user_api": "TEST",
+                "infile_api_key": "TEST",
+            }
+        )
+        self.journal.enable_sending_to_sat = True
+        self.server = InfileMockServer()
+        self.env["ir.config_parameter"].sudo().set_param("l10n_gt_infile.url", self.server.start())
+        self.addCleanup(self.server.stop)
+        self.addCleanup(self.env.company._get_infile_breaker().reset)
+        payment_method = self.env["pos.payment.method"].create({"name": "Tarjeta"})
+        self.config, self.contingency_config = self.env["pos.config"].create(
+            [
+                {
+                    "name": name,
+                    "journal_id": self.journal.id,
+                    "invoice_journal_id": self.journal.id,
+                    "dte_type_id": self.env.ref("l10n_gt_edi.gt_dte_type_fact").id,
+                    "dte_contingency_mode": contingency,
+                    "payment_method_ids": [(6, 0, payment_method.ids)],
+                }
+                for name, contingency in (("Caja 1", False), ("Caja 2", True))
+            ]
+        )
+        self.sessions = self.env["pos.session"].create(
+            [
+                {"config_id": config.id, "user_id": self.env.uid}
+                for config in self.config | self.contingency_config
+            ]
+        )
+
+    def create_orders(self, config, count):
+        """Create paid orders of a point of sale, each one for a new partner
+        Arguments:
+            config {pos.config} -- The point of sale
+            count {int} -- Number of orders
+        Returns:
+            pos.order -- The orders
+        """
+        partners = self.env["res.partner"].create(
+            [
+                dict(self.address, name=f"Cliente {index}", email="c@example.com", vat="CF")
+                for index in range(count)
+            ]
+        )
+        session = self.sessions.filtered(lambda session: session.config_id == config)
+        return self.env["pos.order"].create(
+            [
+                {
+                    "session_id": session.id,
+                    "partner_id": partner.id,
+                    "pricelist_id": config.pricelist_id.id,
+                    "lines": [
+                        (
+                            0,
+                            0,
+                            {
+                                "name": f"{config.name}/{partner.id}",
+                                "product_id": self.products[0].id,
+                                "qty": 2,
+                                "price_unit": 112.0,
+                                "price_subtotal": 200.0,
+                                "price_subtotal_incl": 224.0,
+                                "tax_ids": [(6, 0, self.tax.ids)],
+                            },
+                        )
+                    ],
+                    "amount_tax": 24.0,
+                    "amount_total": 224.0,
+                    "amount_paid": 224.0,
+                    "amount_return": 0.0,
+                    "state": "paid",
+                }
+                for partner in partners
+            ]
+        )
+
+    def test_orders_are_invoiced_together(self):
+        orders = self.create_orders(self.config, 3)
+        contingency = self.create_orders(self.contingency_config, 2)
+        Move = type(self.env["account.move"])
+        with patch.object(Move, "create", autospec=True, side_effect=Move.create) as create:
+            summary = (orders | contingency)._invoice_orders_batch()
+        self.assertEqual(create.call_count, 1)
+        self.assertEqual(len(create.call_args[0][1]), 5)
+
+        self.assertEqual(set((orders | contingency).mapped("state")), {"invoiced"})
+        self.assertEqual(summary["done"], orders.account_move)
+        self.assertEqual(set(orders.account_move.mapped("infile_status")), {"done"})
+        self.assertFalse(any(orders.account_move.mapped("dte_contingency")))
+        messages = orders[0].account_move.message_ids
+        self.assertTrue(any(orders[0].name in message.body for message in messages))
+
+        moves = contingency.account_move
+        self.assertEqual(set(moves.mapped("state")), {"posted"})
+        self.assertEqual(set(moves.mapped("infile_status")), {"not_sent"})
+        self.assertTrue(all(moves.mapped("dte_contingency")))
+        jobs = self.env["gt.dte.job"].search([("move_id", "in", moves.ids)])
+        self.assertEqual(jobs.move_id, moves)
+        self.assertEqual(set(jobs.mapped("state")), {"pending"})
+
+    def test_unreachable_documents_are_retried(self):
+        orders = self.create_orders(self.config, 2)
+        self.server.stop()
+        summary = orders._invoice_orders_batch()
+        moves = orders.account_move
+        self.assertEqual(set(summary["retry"]), set(moves))
+        self.assertTrue(all(moves.mapped("dte_contingency")))
+        jobs = self.env["gt.dte.job"].search([("move_id", "in", moves.ids)])
+        self.assertEqual(jobs.move_id, moves)
+
+    def test_rejected_documents_are_not_queued(self):
+        orders = self.create_orders(self.config, 2)
+        self.server.error_rate = 1.0
+        summary = orders._invoice_orders_batch()
+        moves = orders.account_move
+        self.assertEqual(set(summary["failed"]), set(moves))
+        self.assertEqual(set(moves.mapped("infile_status")), {"error"})
+        self.assertFalse(any(moves.mapped("dte_contingency")))
+        self.assertFalse(self.env["gt.dte.job"].search([("move_id", "in", moves.ids)]))